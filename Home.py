@@ -1,4 +1,5 @@
 import streamlit as st
+from utils.warmup import start_warmup
 
 st.set_page_config(
     page_title="Sinhala Song Emotion AI",
@@ -6,6 +7,9 @@ st.set_page_config(
     layout="wide"
 )
 
+# Warm the model up while the user is still on the home page (no-op if launcher.py already did)
+start_warmup()
+
 # ====================== STYLES ======================
 st.markdown("""
 <style>
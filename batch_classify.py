@@ -0,0 +1,158 @@
+"""Headless batch emotion classification of a directory tree of mp3/wav files.
+
+Usage:
+    python batch_classify.py MUSIC_DIR -o labels.jsonl --workers 8
+    python batch_classify.py MUSIC_DIR -o labels.csv --workers 8
+
+Results are streamed to the output file as each track finishes. Re-running with
+the same output file skips tracks that already have a result in it and
+retries the ones whose latest row is an error.
+"""
+import argparse
+import csv
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from pathlib import Path
+
+from utils.backends import BACKENDS, DEFAULT_BACKEND
+from utils.media import find_audio_files
+
+MAX_AUDIO_DURATION = 100
+
+_model = None
+
+def load_outcomes(output):
+    # Latest row per path from previous (possibly interrupted) runs: path -> error message, "" if classified
+    if not output.exists():
+        return {}
+    outcomes = {}
+    with open(output, "r", newline="", encoding="utf-8") as f:
+        if output.suffix.lower() == ".csv":
+            for row in csv.DictReader(f):
+                if row.get("path"):
+                    outcomes[row["path"]] = row.get("error") or ""
+            return outcomes
+        for line in f:
+            try:
+                row = json.loads(line)
+                outcomes[row["path"]] = row.get("error") or ""
+            except (ValueError, KeyError):
+                continue  # truncated last line from a killed run
+        return outcomes
+
+def _init_worker(model_path, threads, backend):
+    global _model
+    import tensorflow as tf
+    from utils.backends import load_backend
+    if threads:
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    _model = load_backend(model_path, backend, num_threads=threads or None)
+
+def _classify(args):
+    path, duration, early_exit = args
+    import librosa
+    from utils.audio_utils import SR
+    from utils.inference import EMOTION_CLASSES, analyze_windows, top_emotion
+    from utils.streaming import analyze_stream
+    try:
+        if duration is None:
+            preds, avg_pred, _ = analyze_stream(_model, path, early_exit)
+        else:
+            y, _ = librosa.load(path, sr=SR, mono=True, duration=duration)
+            preds, avg_pred, _ = analyze_windows(_model, y, early_exit)
+        emotion, confidence = top_emotion(avg_pred)
+    except Exception as e:
+        return {"path": path, "error": f"{type(e).__name__}: {e}"}
+    row = {"path": path, "emotion": emotion, "confidence": confidence, "chunks": len(preds)}
+    row.update({emo: float(p) for emo, p in zip(EMOTION_CLASSES, avg_pred)})
+    return row
+
+class ResultWriter:
+    def __init__(self, output):
+        from utils.inference import EMOTION_CLASSES
+        self.is_csv = output.suffix.lower() == ".csv"
+        new_file = not output.exists() or output.stat().st_size == 0
+        self.f = open(output, "a", newline="", encoding="utf-8")
+        if self.is_csv:
+            fields = ["path", "emotion", "confidence", "chunks", *EMOTION_CLASSES, "error"]
+            self.writer = csv.DictWriter(self.f, fieldnames=fields)
+            if new_file:
+                self.writer.writeheader()
+
+    def write(self, row):
+        if self.is_csv:
+            self.writer.writerow(row)
+        else:
+            self.f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classify a directory of songs by emotion.")
+    parser.add_argument("root", help="directory to scan recursively for mp3/wav files")
+    parser.add_argument("-o", "--output", default="labels.jsonl", help="output file (.jsonl or .csv)")
+    parser.add_argument("-m", "--model", default="mobileNetV2.keras", help="Keras model path")
+    parser.add_argument("-b", "--backend", default=DEFAULT_BACKEND, choices=BACKENDS, help="inference backend")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--threads-per-worker", type=int, default=1,
+                        help="TensorFlow intra-op threads per worker (0 = TF default)")
+    parser.add_argument("--duration", type=float, default=MAX_AUDIO_DURATION, help="seconds of audio to analyse")
+    parser.add_argument("--full-length", action="store_true",
+                        help="stream and analyse whole tracks at constant memory (ignores --duration)")
+    parser.add_argument("--early-exit", type=float, metavar="MARGIN",
+                        help="stop a track once the top-two gap of its running mean reaches MARGIN "
+                             "(\"chunks\" then counts the windows actually run; with --full-length, "
+                             "windows are taken in playback order)")
+    args = parser.parse_args(argv)
+    duration = None if args.full_length else args.duration
+    if args.backend != "keras":
+        # Convert once up front instead of racing N workers to write the same .tflite file
+        from utils.backends import ensure_converted
+        ensure_converted(args.model, args.backend)
+
+    output = Path(args.output)
+    outcomes = load_outcomes(output)
+    todo = [p for p in find_audio_files(args.root) if outcomes.get(p, "error")]
+    retries = sum(1 for p in todo if p in outcomes)
+    print(f"{len(todo)} files to classify ({len(outcomes) - retries} already done, {retries} failed before)",
+          file=sys.stderr)
+    if not todo:
+        return 0
+
+    writer = ResultWriter(output)
+    ok = failed = 0
+    start = time.perf_counter()
+    ctx = mp.get_context("spawn")
+    try:
+        with ctx.Pool(args.workers, initializer=_init_worker, initargs=(args.model, args.threads_per_worker, args.backend)) as pool:
+            jobs = ((p, duration, args.early_exit) for p in todo)
+            for i, row in enumerate(pool.imap_unordered(_classify, jobs, chunksize=4), 1):
+                writer.write(row)
+                outcomes[row["path"]] = row.get("error", "")
+                if "error" in row:
+                    failed += 1
+                    print(f"error: {row['path']}: {row['error']}", file=sys.stderr)
+                else:
+                    ok += 1
+                if i % 100 == 0:
+                    rate = i / (time.perf_counter() - start)
+                    print(f"{i}/{len(todo)} files, {rate:.2f} files/s", file=sys.stderr)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"classified {ok} files, {failed} errors in {elapsed:.1f}s "
+          f"({(ok + failed) / elapsed:.2f} files/s, {args.workers} workers)", file=sys.stderr)
+    failing = sum(1 for error in outcomes.values() if error)
+    print(f"{output}: {len(outcomes) - failing} files classified, {failing} failing (latest row per file)",
+          file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
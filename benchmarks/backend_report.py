@@ -0,0 +1,96 @@
+"""Compare inference backends against Keras: latency, model size and top-1 agreement.
+
+Usage:
+    python benchmarks/backend_report.py --model mobileNetV2.keras [--audio-dir songs/] [--json report.json]
+
+With --audio-dir the batches are real chunk tensors from the first files found
+there; otherwise they are random mel-shaped inputs (fine for latency, less
+meaningful for agreement).
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.audio_utils import SR, N_MELS, TARGET_FRAMES
+from utils.backends import BACKENDS, load_backend, tflite_path
+
+def audio_batches(audio_dir, max_files):
+    import librosa
+    from utils.inference import window_batch
+    paths = sorted(p for p in Path(audio_dir).rglob("*") if p.suffix.lower() in {".mp3", ".wav"})[:max_files]
+    for p in paths:
+        y, _ = librosa.load(p, sr=SR, mono=True, duration=100)
+        yield window_batch(y)[0]
+
+def random_batches(n, batch_size, seed=0):
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        yield rng.standard_normal((batch_size, N_MELS, TARGET_FRAMES, 3)).astype(np.float32)
+
+def time_backend(backend, batches, repeats):
+    backend.predict(batches[0])  # warm-up (graph tracing / tensor allocation)
+    latencies, outputs = [], []
+    for batch in batches:
+        best = None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            out = np.asarray(backend.predict(batch))
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        latencies.append(best / len(batch))
+        outputs.append(out)
+    return np.array(latencies), np.concatenate(outputs)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="mobileNetV2.keras")
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    parser.add_argument("--audio-dir", help="directory of mp3/wav files to build real input batches from")
+    parser.add_argument("--max-files", type=int, default=20)
+    parser.add_argument("--batches", type=int, default=10, help="random batches when no --audio-dir")
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--json", help="write the report here as JSON")
+    args = parser.parse_args(argv)
+
+    if args.audio_dir:
+        batches = list(audio_batches(args.audio_dir, args.max_files))
+    else:
+        batches = list(random_batches(args.batches, args.batch_size))
+    if not batches:
+        parser.error("no input batches")
+
+    report = {"inputs": int(sum(len(b) for b in batches)), "backends": {}}
+    reference = None
+    for name in ["keras"] + [b for b in args.backends if b != "keras"]:
+        backend = load_backend(args.model, name)
+        latencies, outputs = time_backend(backend, batches, args.repeats)
+        if reference is None:
+            reference = outputs
+        path = Path(args.model) if name == "keras" else tflite_path(args.model, name.split("-", 1)[1])
+        report["backends"][name] = {
+            "size_mb": path.stat().st_size / 1e6,
+            "ms_per_chunk_median": float(np.median(latencies) * 1e3),
+            "ms_per_chunk_p95": float(np.percentile(latencies, 95) * 1e3),
+            "top1_agreement": float(np.mean(outputs.argmax(1) == reference.argmax(1))),
+            "max_abs_prob_diff": float(np.abs(outputs - reference).max()),
+        }
+
+    keras_ms = report["backends"]["keras"]["ms_per_chunk_median"]
+    print(f"{'backend':<13}{'size MB':>9}{'ms/chunk':>10}{'p95':>8}{'speedup':>9}{'top-1 agr':>11}")
+    for name, r in report["backends"].items():
+        print(f"{name:<13}{r['size_mb']:>9.1f}{r['ms_per_chunk_median']:>10.2f}{r['ms_per_chunk_p95']:>8.2f}"
+              f"{keras_ms / r['ms_per_chunk_median']:>8.2f}x{r['top1_agreement']:>11.1%}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""Early-exit library scanning: speedup and label agreement with full inference.
+
+Usage:
+    python benchmarks/bench_early_exit.py [--songs 40] [--margins 0.1 0.2 0.3 0.5] [--model mobileNetV2.keras] [--json ee.json]
+
+Every song of a synthetic corpus (random key, tempo, noise and a contrasting
+section, so windows do not all agree) is turned into the library scan's
+window batch and classified twice: all windows, as the scan did before, and
+with inference.early_exit_predict at each --margin in the given --order.
+Agreement is the share of songs whose label matches the full run. Without
+--model a stand-in classifier reads band energies of the input; its cost is
+simulated as --call-ms per predict call plus --row-ms per window, roughly a
+CPU MobileNetV2, so the timings reflect windows saved and extra calls paid.
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from utils.audio_utils import SR
+from utils.inference import (EARLY_EXIT_MIN_CHUNKS, EARLY_EXIT_STEP, EMOTION_CLASSES, early_exit_predict,
+                             predict_batch, spread_order, window_batch)
+
+ORDERS = {"spread": spread_order, "sequential": lambda n: range(n)}
+
+class BandStub:
+    """Softmax over a fixed projection of 8 standardised mel-band energies, with a simulated forward-pass cost."""
+    name = "band-stub"
+
+    def __init__(self, call_ms, row_ms, scale=1.5, seed=0):
+        self.call = call_ms / 1e3
+        self.row = row_ms / 1e3
+        self.w = np.random.default_rng(seed).standard_normal((8, len(EMOTION_CLASSES))) * scale
+        self.mean, self.std = 0.0, 1.0
+
+    @staticmethod
+    def bands(batch):
+        return batch[..., 0].mean(axis=2).reshape(len(batch), 8, -1).mean(axis=2)
+
+    def fit(self, batches):
+        # Standardise band energies over the corpus so the projection spreads songs over all classes
+        bands = np.concatenate([self.bands(b) for b in batches])
+        self.mean, self.std = bands.mean(axis=0), bands.std(axis=0) + 1e-6
+
+    def predict(self, batch, batch_size=32, verbose=0):
+        time.sleep(self.call + self.row * len(batch))
+        logits = (self.bands(batch) - self.mean) / self.std @ self.w
+        e = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return e / e.sum(axis=1, keepdims=True)
+
+def corpus_song(seed, duration):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * SR)) / SR
+
+    def section(mask):
+        root = 110 * 2 ** rng.uniform(0, 3)
+        beat = rng.uniform(0.3, 0.9)
+        y = np.zeros(mask.sum())
+        for ratio in (1.0, rng.choice([1.19, 1.26]), 1.5, 2.0):
+            y += rng.uniform(0.05, 0.2) * np.sin(2 * np.pi * root * ratio * t[mask])
+        hits = (t[mask] % beat) < 0.03
+        y[hits] += rng.uniform(0.1, 0.6) * rng.standard_normal(hits.sum())
+        return y + rng.uniform(0.002, 0.1) * rng.standard_normal(len(y))
+
+    y = np.zeros_like(t)
+    split = rng.uniform(0.5, 1.0)  # the last part of the song changes character
+    y[t < split * duration] = section(t < split * duration)
+    y[t >= split * duration] = section(t >= split * duration)
+    return (y / np.abs(y).max() * 0.9).astype(np.float32)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--songs", type=int, default=40)
+    parser.add_argument("--duration", type=float, default=100, help="seconds per song (the scan's default)")
+    parser.add_argument("--margins", type=float, nargs="+", default=[0.1, 0.2, 0.3, 0.5])
+    parser.add_argument("--order", choices=list(ORDERS), default="spread")
+    parser.add_argument("--min-chunks", type=int, default=EARLY_EXIT_MIN_CHUNKS)
+    parser.add_argument("--step", type=int, default=EARLY_EXIT_STEP)
+    parser.add_argument("--model", help="real model path; default is the band-energy stand-in")
+    parser.add_argument("--call-ms", type=float, default=5, help="stand-in cost per predict call")
+    parser.add_argument("--row-ms", type=float, default=15, help="stand-in cost per window")
+    parser.add_argument("--json", help="write results here")
+    args = parser.parse_args(argv)
+
+    if args.model:
+        from utils.backends import DEFAULT_BACKEND, load_backend
+        model = load_backend(args.model, DEFAULT_BACKEND)
+    else:
+        model = BandStub(args.call_ms, args.row_ms)
+    batches = [window_batch(corpus_song(seed, args.duration))[0] for seed in range(args.songs)]
+    if not args.model:
+        model.fit(batches)
+    windows = sum(len(b) for b in batches)
+
+    start = time.perf_counter()
+    full = [int(np.argmax(predict_batch(model, b).mean(axis=0))) for b in batches]
+    full_s = time.perf_counter() - start
+
+    rows = []
+    for margin in args.margins:
+        start = time.perf_counter()
+        runs = [early_exit_predict(model, [b], margin, args.min_chunks, args.step, ORDERS[args.order])[0]
+                for b in batches]
+        seconds = time.perf_counter() - start
+        labels = [int(np.argmax(preds.mean(axis=0))) for preds, _ in runs]
+        evaluated = sum(len(used) for _, used in runs)
+        rows.append({"margin": margin, "agreement": float(np.mean(np.equal(labels, full))),
+                     "windows_evaluated": evaluated, "windows_saved": windows - evaluated,
+                     "seconds": seconds, "speedup": full_s / seconds})
+
+    print(f"{args.songs} songs x {args.duration:g} s, {windows} windows, order={args.order}, "
+          f"full inference {full_s:.2f} s, labels {np.bincount(full, minlength=len(EMOTION_CLASSES)).tolist()}")
+    print(f"{'margin':>7}{'agree':>8}{'windows':>10}{'saved':>8}{'seconds':>9}{'speedup':>9}")
+    for r in rows:
+        print(f"{r['margin']:>7.2f}{r['agreement']:>8.1%}{r['windows_evaluated']:>10}"
+              f"{r['windows_saved'] / windows:>8.0%}{r['seconds']:>9.2f}{r['speedup']:>8.2f}x")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"model": getattr(model, "name", args.model), "songs": args.songs, "windows": windows,
+                       "order": args.order, "full_seconds": full_s, "results": rows}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
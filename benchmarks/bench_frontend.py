@@ -0,0 +1,162 @@
+"""Parity, latency and allocations of MelFrontEnd against the original mel/input functions.
+
+Usage:
+    python benchmarks/bench_frontend.py [--duration 100] [--repeats 5] [--json fe.json]
+
+reference_logmel / reference_logmel_chunks / reference_prepare_input /
+reference_build_batch are the functions as they were before
+utils.audio_utils.MelFrontEnd, kept verbatim as the oracle. The workloads
+on synthetic audio: the full-track log-mel, NUM_CHUNKS chunk log-mels one
+by one and via extract_logmel_chunks, and turning those chunks into model
+input (prepare_input per chunk, and build_batch). Allocations are counted
+with tracemalloc (new blocks and peak bytes) on a warm front-end.
+Exits non-zero if any output disagrees beyond float32 tolerance.
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import librosa
+from bench_pipeline import synth_audio
+from utils.audio_utils import SR, N_MELS, N_FFT, HOP_LENGTH, TARGET_FRAMES, MelFrontEnd, extract_logmel_chunks
+from utils.inference import NUM_CHUNKS, chunk_bounds
+
+DB_TOLERANCE = 1e-3  # dB; float32 vs float64 FFT
+INPUT_TOLERANCE = 1e-4  # z-scored units
+
+def reference_logmel(y):
+    mel = librosa.feature.melspectrogram(
+        y=y,
+        sr=SR,
+        n_mels=N_MELS,
+        n_fft=N_FFT,
+        hop_length=HOP_LENGTH
+    )
+    mel = librosa.power_to_db(mel, ref=np.max)
+    return mel.astype(np.float32)
+
+def reference_logmel_chunks(y, num_chunks):
+    chunk_len = len(y) // num_chunks
+    stacked = y[:chunk_len * num_chunks].reshape(num_chunks, chunk_len)
+    power = librosa.feature.melspectrogram(
+        y=stacked,
+        sr=SR,
+        n_mels=N_MELS,
+        n_fft=N_FFT,
+        hop_length=HOP_LENGTH
+    )
+    chunks = [librosa.power_to_db(power[i], ref=np.max).astype(np.float32) for i in range(num_chunks)]
+    mel_full = np.concatenate(list(power), axis=1)
+    mel_full = librosa.power_to_db(mel_full, ref=np.max).astype(np.float32)
+    return mel_full, chunks
+
+def reference_prepare_input(mel):
+    if mel.shape[1] < TARGET_FRAMES:
+        mel = np.pad(mel, ((0,0),(0,TARGET_FRAMES - mel.shape[1])), 'constant')
+    else:
+        mel = mel[:, :TARGET_FRAMES]
+
+    mel = (mel - mel.mean()) / (mel.std() + 1e-6)
+
+    x = np.expand_dims(mel, axis=-1)
+    x = np.repeat(x, 3, axis=-1)
+    return np.expand_dims(x, axis=0)
+
+def reference_build_batch(mels):
+    batch = np.empty((len(mels), N_MELS, TARGET_FRAMES, 3), dtype=np.float32)
+    for i, mel in enumerate(mels):
+        frames = min(mel.shape[1], TARGET_FRAMES)
+        seg = np.zeros((N_MELS, TARGET_FRAMES), dtype=np.float32)
+        seg[:, :frames] = mel[:, :frames]
+        seg = (seg - seg.mean()) / (seg.std() + 1e-6)
+        batch[i] = seg[..., None]
+    return batch
+
+def measure(fn, repeats):
+    fn()  # warm-up: numba/FFT plans, and the front-end's per-thread buffers
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"median_ms": float(np.median(times)) * 1e3, "min_ms": min(times) * 1e3, "peak_mb": peak / 1e6}
+
+def count_allocations(fn):
+    """Number of allocations fn makes, via a tracemalloc snapshot diff."""
+    fn()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    fn()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    return sum(max(d.count_diff, 0) for d in after.compare_to(before, "lineno"))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=100)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--json", help="write results here")
+    args = parser.parse_args(argv)
+
+    y = synth_audio(args.duration, SR)
+    chunks = [y[s:e] for s, e in chunk_bounds(len(y), NUM_CHUNKS)]
+    fe = MelFrontEnd()
+    mels = [reference_logmel(c) for c in chunks]
+    out = np.empty((len(mels), N_MELS, TARGET_FRAMES, 3), dtype=np.float32)
+
+    parity = {
+        "logmel_full_max_abs_db": float(np.abs(fe.logmel(y) - reference_logmel(y)).max()),
+        "logmel_chunks_max_abs_db": float(max(np.abs(fe.logmel(c) - m).max() for c, m in zip(chunks, mels))),
+        "logmel_chunks_shared_max_abs_db": float(max(
+            np.abs(a - b).max() for a, b in zip(extract_logmel_chunks(y, NUM_CHUNKS)[1], mels))),
+        "logmel_chunks_full_max_abs_db": float(np.abs(
+            extract_logmel_chunks(y, NUM_CHUNKS)[0] - reference_logmel_chunks(y, NUM_CHUNKS)[0]).max()),
+        "prepare_input_max_abs": float(max(np.abs(fe.batch([m]) - reference_prepare_input(m)).max() for m in mels)),
+        "build_batch_max_abs": float(np.abs(fe.batch(mels) - reference_build_batch(mels)).max()),
+        "short_clip_max_abs_db": float(np.abs(fe.logmel(y[:SR // 3]) - reference_logmel(y[:SR // 3])).max()),
+    }
+    workloads = {
+        "logmel_full": (lambda: reference_logmel(y), lambda: fe.logmel(y)),
+        "logmel_chunks": (lambda: [reference_logmel(c) for c in chunks], lambda: [fe.logmel(c) for c in chunks]),
+        "logmel_shared": (lambda: reference_logmel_chunks(y, NUM_CHUNKS), lambda: extract_logmel_chunks(y, NUM_CHUNKS)),
+        "prepare_input": (lambda: [reference_prepare_input(m) for m in mels], lambda: [fe.batch([m]) for m in mels]),
+        "build_batch": (lambda: reference_build_batch(mels), lambda: fe.batch(mels, out=out)),
+    }
+    results = {}
+    for name, (ref_fn, new_fn) in workloads.items():
+        results[name] = {"reference": measure(ref_fn, args.repeats), "front_end": measure(new_fn, args.repeats)}
+        results[name]["reference"]["allocations"] = count_allocations(ref_fn)
+        results[name]["front_end"]["allocations"] = count_allocations(new_fn)
+
+    print(f"{args.duration:g} s synthetic audio, {NUM_CHUNKS} chunks")
+    print(f"{'workload':<15}{'ref ms':>9}{'new ms':>9}{'speedup':>9}{'ref allocs':>12}{'new allocs':>12}"
+          f"{'ref peak MB':>13}{'new peak MB':>13}")
+    for name, r in results.items():
+        ref, new = r["reference"], r["front_end"]
+        print(f"{name:<15}{ref['median_ms']:>9.1f}{new['median_ms']:>9.1f}{ref['median_ms'] / new['median_ms']:>8.2f}x"
+              f"{ref['allocations']:>12}{new['allocations']:>12}{ref['peak_mb']:>13.1f}{new['peak_mb']:>13.1f}")
+    for name, value in parity.items():
+        print(f"{name}: {value:.3g}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"duration_s": args.duration, "results": results, "parity": parity}, f, indent=2)
+
+    db_ok = all(v <= DB_TOLERANCE for k, v in parity.items() if k.endswith("_db"))
+    input_ok = all(v <= INPUT_TOLERANCE for k, v in parity.items() if not k.endswith("_db"))
+    return 0 if db_ok and input_ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Concurrent sessions classifying songs: one predict per caller vs the shared micro-batcher.
+
+Usage:
+    python benchmarks/bench_microbatch.py [--sessions 1 4 10] [--songs 8] [--model mobileNetV2.keras] [--json mb.json]
+
+Every session is a thread that classifies --songs songs of NUM_CHUNKS chunks,
+the way the analyzer pages call predict_batch. "direct" calls model.predict
+from each thread, as the pages did before; "batched" goes through
+utils.batching. Without --model a simulated accelerator is used: each call
+holds one device lock for --overhead-ms plus --row-ms per chunk, which is
+where merging calls pays off (fixed per-call cost, one device).
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from utils.audio_utils import N_MELS, TARGET_FRAMES
+from utils.batching import MicroBatcher
+from utils.inference import BATCH_SIZE, EMOTION_CLASSES, NUM_CHUNKS
+
+class SimulatedDevice:
+    name = "simulated"
+
+    def __init__(self, overhead_ms, row_ms):
+        self.overhead = overhead_ms / 1e3
+        self.row = row_ms / 1e3
+        self._lock = threading.Lock()
+
+    def predict(self, batch, batch_size=32, verbose=0):
+        with self._lock:
+            time.sleep(self.overhead + self.row * len(batch))
+        p = np.full((len(batch), len(EMOTION_CLASSES)), 0.1, dtype=np.float32)
+        p[:, 0] += batch[:, 0, 0, 0]  # row-specific output so mixed-up slices would show
+        return p
+
+def run(predict, sessions, songs):
+    rng = np.random.default_rng(0)
+    batch = rng.standard_normal((NUM_CHUNKS, N_MELS, TARGET_FRAMES, 3)).astype(np.float32)
+    latencies, errors = [], []
+
+    def session(i):
+        own = batch.copy()
+        own[:, 0, 0, 0] = i  # tag rows so each caller can check it got its own predictions back
+        for _ in range(songs):
+            start = time.perf_counter()
+            preds = predict(own)
+            latencies.append(time.perf_counter() - start)
+            if len(preds) != NUM_CHUNKS or not np.allclose(preds[:, 0], 0.1 + i):
+                errors.append(i)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    p50, p95 = np.percentile(latencies, [50, 95]) * 1e3
+    return {"songs_per_s": sessions * songs / wall, "p50_ms": float(p50), "p95_ms": float(p95),
+            "mismatched": len(errors)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 10])
+    parser.add_argument("--songs", type=int, default=8, help="songs classified per session")
+    parser.add_argument("--model", help="real model path; default is the simulated device")
+    parser.add_argument("--overhead-ms", type=float, default=40, help="simulated fixed cost per predict call")
+    parser.add_argument("--row-ms", type=float, default=2, help="simulated cost per chunk")
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    parser.add_argument("--json", help="write results here")
+    args = parser.parse_args(argv)
+
+    if args.model:
+        from utils.backends import DEFAULT_BACKEND, load_backend
+        model = load_backend(args.model, DEFAULT_BACKEND)
+    else:
+        model = SimulatedDevice(args.overhead_ms, args.row_ms)
+
+    results = []
+    print(f"{'sessions':>8}{'mode':>9}{'songs/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'rows/batch':>12}")
+    for sessions in args.sessions:
+        direct = run(lambda b: np.asarray(model.predict(b, batch_size=BATCH_SIZE, verbose=0)), sessions, args.songs)
+        batcher = MicroBatcher(model, args.max_batch, args.max_wait_ms)
+        batched = run(batcher.predict, sessions, args.songs)
+        batched["batcher"] = batcher.stats()
+        batcher.close()
+        for mode, r in (("direct", direct), ("batched", batched)):
+            rows = r["batcher"]["mean_batch_rows"] if "batcher" in r else NUM_CHUNKS
+            print(f"{sessions:>8}{mode:>9}{r['songs_per_s']:>10.1f}{r['p50_ms']:>9.0f}{r['p95_ms']:>9.0f}{rows:>12.1f}")
+        results.append({"sessions": sessions, "direct": direct, "batched": batched})
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"model": getattr(model, "name", args.model), "results": results}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
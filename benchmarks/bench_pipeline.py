@@ -0,0 +1,196 @@
+"""End-to-end stage timings on synthetic audio.
+
+Usage:
+    python benchmarks/bench_pipeline.py --duration 100 --json bench.json
+    python benchmarks/bench_pipeline.py --model mobileNetV2.keras --compare bench.json
+
+Every stage of the analyzer pages is timed on its own: decode/resample,
+extract_logmel, prepare_input, prediction, 1 s-hop sliding-window batches
+(strided views vs per-window copies), plot_audio_visuals (+ PNG encode)
+next to the page's envelope/downsampled renderer, extract_features,
+compute_big_five and playlist_profile over 2,000 songs. Without --model a tiny
+stub model is used, so the suite runs without mobileNetV2.keras. --compare exits non-zero
+when any stage is slower than the given baseline by more than --tolerance.
+"""
+import argparse
+import json
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+import matplotlib
+matplotlib.use("Agg")
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import librosa
+from utils.audio_utils import SR, N_MELS, TARGET_FRAMES, extract_logmel, extract_logmel_chunks, prepare_input
+from utils.inference import (NUM_CHUNKS, EMOTION_CLASSES, HOP_SECONDS, chunk_bounds, build_batch, predict_batch,
+                             seconds_to_frames, sliding_starts, sliding_batches)
+from utils.visuals import fig_to_base64, plot_audio_visuals, render_waveform, render_mel
+from utils.personality import extract_features, normalize, level, compute_big_five, playlist_profile
+
+PLAYLIST_SONGS = 2000
+
+def synth_audio(duration, sr, seed=0):
+    """A few seconds-long chords over a 120 BPM click with a little noise; enough structure for tempo/chroma."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * sr)) / sr
+    y = np.zeros_like(t)
+    roots = [220.0, 246.94, 196.0, 174.61]
+    for i, root in enumerate(roots):
+        mask = (t // 4) % len(roots) == i
+        for ratio in (1.0, 1.26, 1.5):
+            y[mask] += 0.15 * np.sin(2 * np.pi * root * ratio * t[mask])
+    beat = (t % 0.5) < 0.02
+    y[beat] += 0.4 * rng.standard_normal(beat.sum())
+    y += 0.01 * rng.standard_normal(len(t))
+    return (y / np.abs(y).max() * 0.9).astype(np.float32)
+
+def stub_model():
+    """Tiny Keras model with the real input/output shapes; numpy fallback when TensorFlow is absent."""
+    try:
+        import tensorflow as tf
+    except ImportError:
+        class NumpyStub:
+            name = "numpy-stub"
+            w = np.random.default_rng(0).standard_normal((3, len(EMOTION_CLASSES))).astype(np.float32)
+
+            def predict(self, batch, batch_size=32, verbose=0):
+                logits = batch.mean(axis=(1, 2)) @ self.w
+                e = np.exp(logits - logits.max(axis=1, keepdims=True))
+                return e / e.sum(axis=1, keepdims=True)
+        return NumpyStub()
+    model = tf.keras.Sequential([
+        tf.keras.Input((N_MELS, TARGET_FRAMES, 3)),
+        tf.keras.layers.Conv2D(8, 3, strides=4, activation="relu"),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(len(EMOTION_CLASSES), activation="softmax"),
+    ], name="keras-stub")
+    return model
+
+def timeit(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, {"min_ms": min(times) * 1e3, "median_ms": float(np.median(times)) * 1e3, "runs": repeats}
+
+def run(args):
+    if args.model:
+        from utils.backends import load_backend
+        model = load_backend(args.model, args.backend)
+        model_name = f"{args.model} ({args.backend})"
+    else:
+        model = stub_model()
+        model_name = getattr(model, "name", "stub")
+
+    tmp = Path(tempfile.mkdtemp())
+    wav = tmp / "synthetic.wav"
+    sf.write(wav, synth_audio(args.duration, args.sr), args.sr)
+
+    stages = {}
+    y, stages["load_resample"] = timeit(lambda: librosa.load(wav, sr=SR, duration=100)[0], args.repeats)
+    mel_full, stages["extract_logmel_full"] = timeit(lambda: extract_logmel(y), args.repeats)
+    bounds = chunk_bounds(len(y), NUM_CHUNKS)
+    mels, stages["extract_logmel_per_chunk"] = timeit(lambda: [extract_logmel(y[s:e]) for s, e in bounds], args.repeats)
+    (_, shared), stages["extract_logmel_shared"] = timeit(lambda: extract_logmel_chunks(y, NUM_CHUNKS), args.repeats)
+    parity = {"logmel_shared_vs_per_chunk_max_abs": float(max(np.abs(a - b).max() for a, b in zip(shared, mels)))}
+    _, stages["prepare_input"] = timeit(lambda: [prepare_input(m) for m in mels], args.repeats)
+    batch, stages["build_batch"] = timeit(lambda: build_batch(mels), args.repeats)
+    predict_batch(model, batch)  # first call traces the graph; not what a warm server pays
+    _, stages["predict"] = timeit(lambda: predict_batch(model, batch), args.repeats)
+    # 1 s hop over the full-track mel: strided views normalised into one reused batch buffer
+    hop = seconds_to_frames(HOP_SECONDS)
+    starts = sliding_starts(mel_full.shape[1], TARGET_FRAMES, hop)
+    _, stages["sliding_batches_1s"] = timeit(lambda: [b for b, _ in sliding_batches(mel_full, TARGET_FRAMES, hop)], args.repeats)
+    _, stages["sliding_batches_1s_copies"] = timeit(
+        lambda: build_batch([mel_full[:, s:s + TARGET_FRAMES] for s in starts]), args.repeats)
+    parity["sliding_vs_build_batch_max_abs"] = float(max(
+        np.abs(b - build_batch([mel_full[:, s:s + TARGET_FRAMES] for s in idx])).max()
+        for b, idx in sliding_batches(mel_full, TARGET_FRAMES, hop)))
+    _, stages["plot_audio_visuals"] = timeit(
+        lambda: [fig_to_base64(f) for f in plot_audio_visuals(y, mel_full)], args.repeats)
+    _, stages["render_visuals"] = timeit(lambda: (render_waveform(y), render_mel(mel_full, 500, 100)), args.repeats)
+    features, stages["extract_features"] = timeit(lambda: extract_features(str(wav)), args.repeats)
+    tempo, energy, timbre, mode = features
+    levels = {
+        "tempo": level(normalize(tempo, "tempo_bpm")),
+        "energy": level(normalize(energy, "loudness_db")),
+        "timbre": level(normalize(timbre, "timbre_spectral_centroid")),
+        "mode": mode,
+    }
+    _, stages["compute_big_five"] = timeit(lambda: compute_big_five(levels), args.repeats)
+    rng = np.random.default_rng(0)
+    library = [(tempo * rng.uniform(0.5, 1.5), energy + rng.uniform(-6, 6), timbre * rng.uniform(0.5, 1.5),
+                rng.choice(["Major", "Minor"])) for _ in range(PLAYLIST_SONGS)]
+    _, stages["playlist_profile"] = timeit(lambda: playlist_profile(library), args.repeats)
+    shutil.rmtree(tmp, ignore_errors=True)
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "model": model_name,
+        "audio": {"duration_s": args.duration, "sr": args.sr},
+        "stages": stages,
+        "parity": parity,
+    }
+
+def compare(result, baseline, tolerance):
+    regressions = []
+    print(f"{'stage':<24}{'baseline':>10}{'now':>10}{'ratio':>8}")
+    for stage, now in result["stages"].items():
+        before = baseline.get("stages", {}).get(stage)
+        if before is None:
+            print(f"{stage:<24}{'-':>10}{now['min_ms']:>10.1f}")
+            continue
+        ratio = now["min_ms"] / max(before["min_ms"], 1e-9)
+        flag = "  REGRESSION" if ratio > 1 + tolerance else ""
+        print(f"{stage:<24}{before['min_ms']:>10.1f}{now['min_ms']:>10.1f}{ratio:>7.2f}x{flag}")
+        if flag:
+            regressions.append(stage)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=100, help="synthetic audio length in seconds")
+    parser.add_argument("--sr", type=int, default=SR, help="sample rate of the synthetic file (exercises resampling)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--model", help="real model path; a stub model is used when omitted")
+    parser.add_argument("--backend", default="keras")
+    parser.add_argument("--json", help="write results here")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before flagging (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    result = run(args)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        return 1 if regressions else 0
+    print(f"{'stage':<24}{'min ms':>10}{'median ms':>11}")
+    for stage, t in result["stages"].items():
+        print(f"{stage:<24}{t['min_ms']:>10.1f}{t['median_ms']:>11.1f}")
+    for name, value in result["parity"].items():
+        print(f"{name}: {value:.3g}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Time-to-first-prediction from a fresh process, with and without the startup warm-up.
+
+Usage:
+    python benchmarks/bench_startup.py [--model mobileNetV2.keras] [--json startup.json]
+
+Each measurement runs in a new interpreter so imports are genuinely cold.
+"cold" is what the first user paid before: import TF/librosa, load the model
+and classify 10 s of audio inside their request. "warm" runs utils.warmup
+first (as launcher.py/Home.py now do) and then times the same request.
+Without --model a small stub Keras model is saved to a temp file and used.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def user_request(model_path):
+    # What the first page view does: mel of a clip, then one prediction
+    import numpy as np
+    from utils.audio_utils import SR, extract_logmel
+    from utils.backends import DEFAULT_BACKEND
+    from utils.inference import build_batch, predict_batch
+    from utils.model_loader import load_emotion_model
+    model = load_emotion_model(model_path, DEFAULT_BACKEND)
+    y = (0.1 * np.sin(2 * np.pi * 220 * np.arange(SR * 10) / SR)).astype(np.float32)
+    return predict_batch(model, build_batch([extract_logmel(y)]))
+
+def child(mode, model_path):
+    sys.path.insert(0, str(ROOT))
+    result = {"mode": mode}
+    start = time.perf_counter()
+    if mode == "warm":
+        from utils.warmup import start_warmup, wait_warmup, warmup_status
+        start_warmup(model_path)
+        wait_warmup()
+        status = warmup_status()
+        if status["error"]:
+            raise SystemExit(status["error"])
+        result["warmup_s"] = time.perf_counter() - start
+        result["warmup_steps_s"] = status["steps"]
+    request_start = time.perf_counter()
+    user_request(model_path)
+    result["first_prediction_s"] = time.perf_counter() - request_start
+    result["process_to_prediction_s"] = time.perf_counter() - start
+    print(json.dumps(result))
+
+def stub_model_path(tmp):
+    import tensorflow as tf
+    from utils.audio_utils import N_MELS, TARGET_FRAMES
+    from utils.inference import EMOTION_CLASSES
+    model = tf.keras.Sequential([
+        tf.keras.Input((N_MELS, TARGET_FRAMES, 3)),
+        tf.keras.layers.Conv2D(8, 3, strides=4, activation="relu"),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(len(EMOTION_CLASSES), activation="softmax"),
+    ])
+    path = Path(tmp) / "stub.keras"
+    model.save(path)
+    return str(path)
+
+def measure(mode, model_path):
+    out = subprocess.run([sys.executable, __file__, "--child", mode, "--model", model_path],
+                         cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", help="model path; a stub Keras model is used when omitted")
+    parser.add_argument("--json", help="write results here")
+    parser.add_argument("--child", choices=["cold", "warm"], help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(args.child, args.model)
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.model:
+            model_path = str(Path(args.model).resolve())
+        else:
+            sys.path.insert(0, str(ROOT))
+            model_path = stub_model_path(tmp)
+        results = {"cold": measure("cold", model_path), "warm": measure("warm", model_path)}
+
+    cold, warm = results["cold"], results["warm"]
+    print(f"cold: first prediction {cold['first_prediction_s']:.2f}s after process start")
+    print(f"warm: warm-up {warm['warmup_s']:.2f}s, then first prediction {warm['first_prediction_s']:.3f}s")
+    for step, seconds in warm["warmup_steps_s"].items():
+        print(f"  {step:<18}{seconds:>8.2f}s")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""Link analysis against a local HTTP stand-in: old download+MP3 path vs ranged native decode.
+
+Usage:
+    python benchmarks/bench_youtube_fetch.py [--minutes 6] [--codec aac|opus] [--mbps 20] [--json yt.json]
+
+A synthetic song is encoded with ffmpeg into a native streaming container
+(m4a/AAC or webm/Opus, as YouTube serves them) and served from a local
+http.server that counts the bytes it sends, throttled to --mbps (localhost
+socket buffers would otherwise swallow the whole file at once). Three paths
+are timed:
+
+  download_mp3  what the page did before: fetch the whole stream, transcode
+                to 192 kbps MP3, then decode the first 100 s with librosa
+  ranged        utils.youtube.decode straight from the URL, first 100 s only
+  cached        analyze_link a second time for the same link
+
+resolve() only accepts YouTube links, so the stand-in URL reaches
+analyze_link through its resolver= argument, and ffmpeg's protocol
+whitelist is widened to plain http for the local server.
+
+Requires ffmpeg on PATH, like the page itself.
+"""
+import argparse
+import functools
+import http.server
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from bench_pipeline import synth_audio, stub_model
+from utils.audio_utils import SR
+from utils.cache import AnalysisCache
+import utils.cache
+import utils.youtube
+from utils.media import FFMPEG
+from utils.youtube import AudioSource, analyze_link, decode
+
+CODECS = {"aac": ("m4a", ["-c:a", "aac", "-b:a", "128k", "-movflags", "+faststart"]),
+          "opus": ("webm", ["-c:a", "libopus", "-b:a", "128k"])}
+
+class CountingHandler(http.server.SimpleHTTPRequestHandler):
+    sent = 0
+    mbps = 20
+
+    def copyfile(self, source, outputfile):
+        try:
+            while chunk := source.read(64 * 1024):
+                outputfile.write(chunk)
+                CountingHandler.sent += len(chunk)
+                time.sleep(len(chunk) * 8 / (self.mbps * 1e6))
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client stopped reading: exactly what a ranged decode does
+
+    def log_message(self, *args):
+        pass
+
+def serve(directory):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(CountingHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def measure(fn):
+    CountingHandler.sent = 0
+    start = time.perf_counter()
+    result = fn()
+    return result, {"seconds": time.perf_counter() - start, "bytes_fetched": CountingHandler.sent}
+
+def download_mp3(url, tmp):
+    import librosa
+    raw, mp3 = tmp / "download.bin", tmp / "download.mp3"
+    with urllib.request.urlopen(url) as r, open(raw, "wb") as f:
+        shutil.copyfileobj(r, f)
+    subprocess.run([FFMPEG, "-nostdin", "-v", "error", "-y", "-i", str(raw), "-b:a", "192k", str(mp3)], check=True)
+    return librosa.load(mp3, sr=SR, mono=True, duration=100)[0]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=float, default=6, help="length of the served song")
+    parser.add_argument("--codec", choices=list(CODECS), default="aac")
+    parser.add_argument("--mbps", type=float, default=20, help="stand-in server bandwidth")
+    parser.add_argument("--json", help="write results here")
+    args = parser.parse_args(argv)
+
+    tmp = Path(tempfile.mkdtemp())
+    ext, codec_args = CODECS[args.codec]
+    wav, song = tmp / "song.wav", tmp / f"song.{ext}"
+    sf.write(wav, synth_audio(args.minutes * 60, SR), SR)
+    subprocess.run([FFMPEG, "-nostdin", "-v", "error", "-y", "-i", str(wav), *codec_args, str(song)], check=True)
+    CountingHandler.mbps = args.mbps
+    server = serve(str(tmp))
+    url = f"http://127.0.0.1:{server.server_port}/{song.name}"
+    utils.youtube.PROTOCOL_WHITELIST = "http,tcp"
+    resolver = lambda link: AudioSource("bench", link, {})
+
+    # A private analysis cache so "cached" measures this run only
+    utils.cache._default_cache = AnalysisCache(tmp / "cache")
+    model, model_id = stub_model(), "stub"
+    results = {"song": {"codec": args.codec, "minutes": args.minutes, "bytes": song.stat().st_size}}
+    y_old, results["download_mp3"] = measure(lambda: download_mp3(url, tmp))
+    y_new, results["ranged"] = measure(lambda: decode(AudioSource("bench", url, {}), SR, 100))
+    analyze_link(model, model_id, url, resolver=resolver)
+    _, results["cached"] = measure(lambda: analyze_link(model, model_id, url, resolver=resolver))
+    n = min(len(y_old), len(y_new))
+    results["samples"] = {"download_mp3": len(y_old), "ranged": len(y_new)}
+    results["rms_db"] = {"download_mp3": float(20 * np.log10(np.sqrt(np.mean(y_old[:n] ** 2)))),
+                         "ranged": float(20 * np.log10(np.sqrt(np.mean(y_new[:n] ** 2))))}
+    server.shutdown()
+    shutil.rmtree(tmp, ignore_errors=True)
+
+    print(f"{args.minutes:g} min {args.codec} song, {results['song']['bytes'] / 1e6:.1f} MB")
+    for name in ("download_mp3", "ranged", "cached"):
+        r = results[name]
+        print(f"{name:<14}{r['seconds']:>8.2f}s{r['bytes_fetched'] / 1e6:>9.2f} MB fetched")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Parity and speed of the single-STFT personality extractor against the original per-feature version.
+
+Usage:
+    python benchmarks/parity_features.py [--audio-dir songs/] [--duration 90]
+
+reference_features is the extractor as it was before the feature graph
+(separate onset_strength / spectral_centroid / chroma_stft passes, np.roll
+mode loop, while-loop tempo folding), kept verbatim as the oracle. Exits
+non-zero if any feature disagrees beyond float tolerance.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import librosa
+from utils.personality import SR, extract_features_from_signal
+
+def reference_features(y, sr):
+    onset_env = librosa.onset.onset_strength(y=y, sr=sr)
+    tempo_candidates = np.array(librosa.beat.tempo(onset_envelope=onset_env, sr=sr, aggregate=None))
+    tempo_candidates = tempo_candidates[(tempo_candidates > 40) & (tempo_candidates < 200)]
+    normalized_tempos = []
+    for t in tempo_candidates:
+        while t < 60:
+            t *= 2
+        while t > 180:
+            t /= 2
+        normalized_tempos.append(t)
+    normalized_tempos = np.array(normalized_tempos)
+    tempo = float(np.median(normalized_tempos)) if len(normalized_tempos) > 0 else float(np.mean(tempo_candidates))
+
+    rms = librosa.feature.rms(y=y)[0]
+    loudness_db = float(np.mean(librosa.amplitude_to_db(rms, ref=np.max)))
+
+    timbre = float(np.mean(librosa.feature.spectral_centroid(y=y, sr=sr)))
+
+    chroma_mean = np.mean(librosa.feature.chroma_stft(y=y, sr=sr), axis=1)
+    major_template = np.array([1, 0, 1, 0, 1, 1, 0, 1, 0, 1, 0, 1])
+    minor_template = np.array([1, 0, 1, 1, 0, 1, 0, 1, 1, 0, 1, 0])
+    major_scores, minor_scores = [], []
+    for i in range(12):
+        rotated = np.roll(chroma_mean, -i)
+        major_scores.append(np.dot(rotated, major_template))
+        minor_scores.append(np.dot(rotated, minor_template))
+    mode = "Minor" if (max(minor_scores) * 1.05) > max(major_scores) else "Major"
+    return tempo, loudness_db, timbre, mode
+
+def synthetic_signals(duration, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * SR)) / SR
+    for bpm, root, third in [(72, 220.0, 1.1892), (128, 261.63, 1.2599), (95, 196.0, 1.1892), (170, 293.66, 1.2599)]:
+        beat = (t % (60 / bpm)) < 0.03
+        y = sum(0.2 * np.sin(2 * np.pi * root * r * t) for r in (1.0, third, 1.4983))
+        y = y * (0.6 + 0.4 * np.sin(2 * np.pi * t / 7)) + 0.5 * beat * rng.standard_normal(len(t))
+        yield f"synthetic {bpm} bpm", (y / np.abs(y).max()).astype(np.float32)
+
+def file_signals(audio_dir, duration):
+    for p in sorted(Path(audio_dir).rglob("*")):
+        if p.suffix.lower() in {".mp3", ".wav"}:
+            yield p.name, librosa.load(p, sr=SR, duration=duration)[0]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--audio-dir")
+    parser.add_argument("--duration", type=float, default=90)
+    args = parser.parse_args(argv)
+
+    signals = file_signals(args.audio_dir, args.duration) if args.audio_dir else synthetic_signals(args.duration)
+    warm = np.random.default_rng(1).standard_normal(SR).astype(np.float32)
+    reference_features(warm, SR), extract_features_from_signal(warm, SR)  # numba JIT outside the timings
+    failures = 0
+    t_ref = t_new = 0.0
+    for name, y in signals:
+        start = time.perf_counter()
+        ref = reference_features(y, SR)
+        t_ref += time.perf_counter() - start
+        start = time.perf_counter()
+        new = extract_features_from_signal(y, SR)
+        t_new += time.perf_counter() - start
+        ok = np.allclose(ref[:3], new[:3], rtol=1e-6, atol=1e-6, equal_nan=True) and ref[3] == new[3]
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name}: reference={ref} new={new}")
+    print(f"reference {t_ref:.2f}s, feature graph {t_new:.2f}s ({t_ref / max(t_new, 1e-9):.2f}x)")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
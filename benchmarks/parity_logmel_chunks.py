@@ -0,0 +1,74 @@
+"""Parity of extract_logmel_chunks (one shared power map) against extract_logmel on each chunk.
+
+Usage:
+    python benchmarks/parity_logmel_chunks.py [--audio-dir songs/] [--duration 100] [--num-chunks 10]
+
+For every signal, chunks[i] from extract_logmel_chunks must match
+extract_logmel(y[chunk_i]) for the slices inference.chunk_bounds cuts,
+including lengths that don't divide evenly by --num-chunks (the tail is
+dropped by both), and librosa's melspectrogram + power_to_db on each chunk
+within float32 tolerance. The first return value is also checked against its
+documented meaning: the per-chunk power frames laid end to end, in dB
+against their joint maximum. Exits non-zero on any mismatch.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import librosa
+from utils.audio_utils import SR, N_MELS, N_FFT, HOP_LENGTH, get_front_end, extract_logmel, extract_logmel_chunks
+from utils.inference import NUM_CHUNKS, chunk_bounds
+
+TOLERANCE_DB = 1e-4
+LIBROSA_TOLERANCE_DB = 1e-3  # float32 vs float64 FFT
+
+def librosa_logmel(y):
+    mel = librosa.feature.melspectrogram(y=y, sr=SR, n_mels=N_MELS, n_fft=N_FFT, hop_length=HOP_LENGTH)
+    return librosa.power_to_db(mel, ref=np.max).astype(np.float32)
+
+def synthetic_signals(duration, num_chunks, seed=0):
+    rng = np.random.default_rng(seed)
+    # Even split, ragged tail, and chunks shorter than one STFT window
+    for n in (int(duration * SR) // num_chunks * num_chunks, int(duration * SR) + num_chunks - 1, num_chunks * 1500):
+        t = np.arange(n) / SR
+        y = 0.3 * np.sin(2 * np.pi * 220 * t) * (1 + np.sin(2 * np.pi * t / 5)) + 0.05 * rng.standard_normal(n)
+        yield f"synthetic {n} samples", y.astype(np.float32)
+
+def file_signals(audio_dir, duration):
+    for p in sorted(Path(audio_dir).rglob("*")):
+        if p.suffix.lower() in {".mp3", ".wav"}:
+            yield p.name, librosa.load(p, sr=SR, duration=duration)[0]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--audio-dir")
+    parser.add_argument("--duration", type=float, default=100)
+    parser.add_argument("--num-chunks", type=int, default=NUM_CHUNKS)
+    args = parser.parse_args(argv)
+
+    signals = (file_signals(args.audio_dir, args.duration) if args.audio_dir
+               else synthetic_signals(args.duration, args.num_chunks))
+    fe = get_front_end()
+    failures = 0
+    for name, y in signals:
+        mel_full, chunks = extract_logmel_chunks(y, args.num_chunks)
+        per_chunk = [extract_logmel(y[s:e]) for s, e in chunk_bounds(len(y), args.num_chunks)]
+        chunk_diff = max(np.abs(a - b).max() for a, b in zip(chunks, per_chunk))
+        librosa_diff = max(np.abs(a - librosa_logmel(y[s:e])).max()
+                           for a, (s, e) in zip(chunks, chunk_bounds(len(y), args.num_chunks)))
+        joined = fe.to_db(np.concatenate([fe.power_mel(y[s:e]) for s, e in chunk_bounds(len(y), args.num_chunks)],
+                                         axis=1))
+        full_diff = np.abs(mel_full - joined).max()
+        ok = (len(chunks) == args.num_chunks and all(a.shape == b.shape for a, b in zip(chunks, per_chunk))
+              and chunk_diff <= TOLERANCE_DB and full_diff <= TOLERANCE_DB and librosa_diff <= LIBROSA_TOLERANCE_DB)
+        failures += not ok
+        print(f"{name:<28} chunks {chunk_diff:.2e} dB   vs librosa {librosa_diff:.2e} dB   joined map {full_diff:.2e} dB   "
+              f"{'ok' if ok else 'MISMATCH'}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""Recalibrate feature_reference.json from a directory tree of mp3/wav files.
+
+Usage:
+    python calibrate_features.py MUSIC_DIR --workers 8
+    python calibrate_features.py MUSIC_DIR -o feature_reference.json --low 1 --high 99
+
+Personality features are extracted in a process pool, one shard of files per
+task. Each task returns a small quantile-sketch summary instead of raw values,
+and the summaries are merged as they arrive, so memory does not grow with the
+corpus. The merged summary, the finished paths and the latest error of each
+failing path are saved to --state every STATE_INTERVAL seconds and at the
+end; re-running with the same state file resumes where it stopped and
+retries the files that failed.
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from pathlib import Path
+
+from utils.calibration import FeatureSummary
+from utils.media import find_audio_files
+from utils.personality import REFERENCE_PATH
+
+SHARD_SIZE = 32
+STATE_INTERVAL = 30  # seconds between resume-state saves; the path list gets large on big corpora
+
+def _summarize_shard(paths):
+    from utils.personality import extract_features
+    summary, errors = FeatureSummary(), []
+    for path in paths:
+        try:
+            summary.add(extract_features(path))
+        except Exception as e:
+            errors.append({"path": path, "error": f"{type(e).__name__}: {e}"})
+    return paths, summary, errors
+
+def write_json(path, data):
+    tmp = Path(f"{path}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp, path)
+
+def load_state(path):
+    # (summary, paths whose features are in it, path -> latest error of files still failing)
+    if not path.exists():
+        return FeatureSummary(), set(), {}
+    with open(path) as f:
+        state = json.load(f)
+    return FeatureSummary.from_dict(state["summary"]), set(state["done"]), state.get("failed", {})
+
+def load_reference(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recalibrate personality feature bounds over a corpus.")
+    parser.add_argument("root", help="directory to scan recursively for mp3/wav files")
+    parser.add_argument("-o", "--output", default=REFERENCE_PATH, help="reference JSON to write")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--low", type=float, default=1.0, help="percentile used as each feature's min")
+    parser.add_argument("--high", type=float, default=99.0, help="percentile used as each feature's max")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE, help="files per worker task")
+    parser.add_argument("--state", default="calibration_state.json", help="resume state file")
+    args = parser.parse_args(argv)
+
+    state_path = Path(args.state)
+    summary, done, failing = load_state(state_path)
+    todo = [p for p in find_audio_files(args.root) if p not in done]
+    retries = sum(1 for p in todo if p in failing)
+    print(f"{len(todo)} files to calibrate ({len(done)} already done, {retries} failed before)", file=sys.stderr)
+
+    failed = 0
+    start = time.perf_counter()
+    if todo:
+        shards = [todo[i:i + args.shard_size] for i in range(0, len(todo), args.shard_size)]
+        ctx = mp.get_context("spawn")
+        with ctx.Pool(args.workers) as pool:
+            processed, saved_at = 0, time.perf_counter()
+            for paths, shard_summary, errors in pool.imap_unordered(_summarize_shard, shards):
+                summary.merge(shard_summary)
+                errored = {err["path"]: err["error"] for err in errors}
+                for path in paths:
+                    if path in errored:
+                        failing[path] = errored[path]
+                        print(f"error: {path}: {errored[path]}", file=sys.stderr)
+                    else:
+                        done.add(path)  # only successes are skipped on resume
+                        failing.pop(path, None)
+                failed += len(errors)
+                processed += len(paths)
+                if processed == len(todo) or time.perf_counter() - saved_at > STATE_INTERVAL:
+                    write_json(state_path, {"summary": summary.to_dict(), "done": sorted(done), "failed": failing})
+                    saved_at = time.perf_counter()
+                rate = processed / (time.perf_counter() - start)
+                print(f"{processed}/{len(todo)} files, {rate:.2f} files/s", file=sys.stderr)
+
+    if summary.count == 0:
+        print("no features extracted; reference left unchanged", file=sys.stderr)
+        return 1
+    # Features that failed on every file keep their current bounds
+    previous = load_reference(args.output)
+    try:
+        reference = summary.reference(args.low, args.high, previous)
+    except ValueError as e:
+        print(f"{e}; reference left unchanged", file=sys.stderr)
+        return 1
+    write_json(args.output, reference)
+    for name, bounds in reference.items():
+        if "observed_min" not in bounds:
+            print(f"{name:<26}{bounds['min']:>12.3f}{bounds['max']:>12.3f}  (no values; kept previous)", file=sys.stderr)
+            continue
+        print(f"{name:<26}{bounds['min']:>12.3f}{bounds['max']:>12.3f}  "
+              f"(observed {bounds['observed_min']:.3f}..{bounds['observed_max']:.3f})", file=sys.stderr)
+    elapsed = time.perf_counter() - start
+    print(f"calibrated on {summary.count} files, {failed} errors in {elapsed:.1f}s -> {args.output} "
+          f"({len(failing)} files failing in total)", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,16 @@
-import subprocess
-import sys
 import os
+import sys
+
+from utils.warmup import start_warmup
 
 # Path to the main Streamlit app
 app_path = os.path.join(os.path.dirname(__file__), "Home.py")
 
+# Import TF/librosa, load the model and run one dummy prediction in the background
+# while the server boots. Streamlit runs in this same process so the pages pick
+# the warmed model up from the shared cache instead of loading it again.
+start_warmup()
+
 # Launch Streamlit
-subprocess.run([sys.executable, "-m", "streamlit", "run", app_path])
+from streamlit.web import bootstrap
+bootstrap.run(app_path, False, sys.argv[1:], {})
@@ -4,23 +4,20 @@
 
 import streamlit as st
 import numpy as np
-import tensorflow as tf
-import librosa, librosa.display
-import io, time, base64
-import matplotlib.pyplot as plt
-import soundfile as sf
+import math, time
 from pathlib import Path
+from utils.audio_utils import SR
+from utils.inference import EMOTION_CLASSES, NUM_CHUNKS, HOP_SECONDS
+from utils.visuals import cached_visuals, waveform_chart_spec, mel_chart_spec
+from utils.cache import model_identity
+from utils.analysis_record import get_record
+from utils.backends import DEFAULT_BACKEND
+from utils.model_loader import load_emotion_model
+from utils.timing import span, diagnostics_panel
+from utils.jobs import run_job
 
 # ====================== 1. CONFIG ======================
-SR = 44100
-N_MELS = 128
-N_FFT = 2048
-HOP_LENGTH = 1024
 MAX_AUDIO_DURATION = 100
-NUM_CHUNKS = 10
-TARGET_FRAMES = 431
-
-EMOTION_CLASSES = ["Calm", "Energetic", "Happy", "Romantic", "Sad"]
 EMO_ICONS = {"Calm": "🍃", "Energetic": "🔥", "Happy": "😊", "Romantic": "💖", "Sad": "🥺"}
 
 # ====================== 2. PAGE & PREMIUM CSS ======================
@@ -114,15 +111,11 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # ====================== 3. MODEL LOADER ======================
-@st.cache_resource
-def load_model(path: str):
-    return tf.keras.models.load_model(path)
-
 with st.sidebar:
     st.markdown("<h3 style='color:#ffd700;'>🧠 AI Engine</h3>", unsafe_allow_html=True)
     model_path = st.text_input("Model path", "mobileNetV2.keras")
     try:
-        model = load_model(model_path)
+        model = load_emotion_model(model_path, DEFAULT_BACKEND)
         st.success("AI Model Active")
     except Exception as e:
         st.error("Model Not Found")
@@ -132,33 +125,18 @@ with st.sidebar:
     st.markdown("<h3 style='color:#ffd700;'>ℹ️ AI Info </h3>", unsafe_allow_html=True)
     st.write("This engine uses **MobileNetV2** for feature extraction from Log-Mel-Spectrograms.")
 
-# ====================== 4. HELPERS ======================
-def extract_logmel(y):
-    mel = librosa.feature.melspectrogram(y=y, sr=SR, n_mels=N_MELS, n_fft=N_FFT, hop_length=HOP_LENGTH)
-    return librosa.power_to_db(mel, ref=np.max).astype(np.float32)
+    # Charts draw in the browser from small arrays instead of server-rendered images
+    array_charts = st.checkbox("Lightweight charts", value=False, help="Send waveform and mel data as compact arrays instead of PNG images")
 
-def fig_to_base64(fig):
-    buf = io.BytesIO()
-    fig.savefig(buf, format="png", bbox_inches="tight", dpi=100, transparent=True)
-    plt.close(fig)
-    return base64.b64encode(buf.getvalue()).decode()
+    # Overlapping windows give a timeline at hop resolution instead of 10 s slices
+    sliding = st.checkbox("Sliding-window timeline", value=False, help="Classify overlapping windows for a finer emotion timeline")
+    if sliding:
+        window_seconds = st.slider("Window (s)", 2.0, 10.0, 10.0, 0.5)
+        hop_seconds = st.slider("Hop (s)", 0.5, 5.0, HOP_SECONDS, 0.5)
 
-def plot_audio_visuals(y, mel):
-    # Waveform
-    fig1, ax1 = plt.subplots(figsize=(10, 2))
-    librosa.display.waveshow(y, sr=SR, ax=ax1, color="#ffd700", alpha=0.6)
-    ax1.axis('off')
-    fig1.patch.set_alpha(0)
-    
-    # Mel
-    fig2, ax2 = plt.subplots(figsize=(10, 2))
-    librosa.display.specshow(mel, sr=SR, cmap='magma', ax=ax2)
-    ax2.axis('off')
-    fig2.patch.set_alpha(0)
-    
-    return fig1, fig2
+diagnostics_panel()
 
-# ====================== 5. MAIN UI LOGIC ======================
+# ====================== 4. MAIN UI LOGIC ======================
 st.markdown("<h1 class='main-title'>🎧 Sinhala Song Emotion AI</h1>", unsafe_allow_html=True)
 st.markdown("<p class='sub-title'>High-Precision Deep Learning Analysis</p>", unsafe_allow_html=True)
 st.markdown("<hr style='border: 0; height: 1px; background: linear-gradient(to right, transparent, rgba(255,215,0,0.3), transparent);'>", unsafe_allow_html=True)
@@ -205,50 +183,60 @@ else:
             st.rerun()
 
     st.markdown("<br>", unsafe_allow_html=True)
-    st.audio(uploaded_file)
+    with span("upload_read"):
+        audio_bytes = uploaded_file.getvalue()
+    audio_mime = uploaded_file.type or "audio/mpeg"
+    st.audio(audio_bytes, format=audio_mime)
     
     # Analysis Processing
     st.markdown("<hr style='border: 0; height: 1px; background: linear-gradient(to right, transparent, rgba(255,215,0,0.3), transparent);'>", unsafe_allow_html=True)
-    with st.spinner("🧠 AI Deep Scan in Progress..."):
-        y, _ = librosa.load(uploaded_file, sr=SR, duration=MAX_AUDIO_DURATION)
-        mel_full = extract_logmel(y)
-        
-        # Visualize
-        f1, f2 = plot_audio_visuals(y, mel_full)
-        v_col1, v_col2 = st.columns(2)
-        with v_col1:
-            st.markdown("<p style='color:#888; text-align:center;'>Waveform Signature</p>", unsafe_allow_html=True)
-            st.markdown(f"<img src='data:image/png;base64,{fig_to_base64(f1)}' style='width:100%;'>", unsafe_allow_html=True)
-        with v_col2:
-            st.markdown("<p style='color:#888; text-align:center;'>Spectral Mel-Map</p>", unsafe_allow_html=True)
-            st.markdown(f"<img src='data:image/png;base64,{fig_to_base64(f2)}' style='width:100%;'>", unsafe_allow_html=True)
+    # One shared record per song: decode, mel and predictions are reused across pages and reruns
+    record = get_record(audio_bytes)
+    model_id = model_identity(model_path)
 
-        # Chunk Processing Logic
-        chunk_len = len(y) // NUM_CHUNKS
-        preds = []
-        timeline = []
-        for i in range(NUM_CHUNKS):
-            chunk = y[i*chunk_len:(i+1)*chunk_len]
-            mel = extract_logmel(chunk)
-            
-            # Pad or Trim to TARGET_FRAMES
-            if mel.shape[1] < TARGET_FRAMES:
-                mel = np.pad(mel, ((0,0),(0,TARGET_FRAMES - mel.shape[1])), 'constant')
-            else:
-                mel = mel[:, :TARGET_FRAMES]
-            
-            mel = (mel - mel.mean()) / (mel.std() + 1e-6)
-            inp = np.repeat(np.expand_dims(mel, axis=[-1]), 3, axis=-1)
-            inp = np.expand_dims(inp, axis=0)
-            
-            p = model.predict(inp, verbose=0)[0]
-            preds.append(p)
-            timeline.append((i*chunk_len/SR, (i+1)*chunk_len/SR, EMOTION_CLASSES[int(np.argmax(p))]))
+    def deep_scan(job):
+        job.report(0.1, "🧠 Decoding audio...")
+        record.signal(SR, MAX_AUDIO_DURATION)
+        job.check_cancelled()
+        job.report(0.5, "🧠 Running emotion model...")
+        if sliding:
+            return record.sliding_emotion(model, model_id, window_seconds, hop_seconds, MAX_AUDIO_DURATION)
+        return record.emotion(model, model_id, NUM_CHUNKS, MAX_AUDIO_DURATION)
+
+    # Runs on the shared job pool: reruns and other tabs with the same song wait on the same job
+    scan_params = ("sliding", window_seconds, hop_seconds) if sliding else ("chunks", NUM_CHUNKS)
+    scan = run_job(("deep_scan", record.digest, model_id, MAX_AUDIO_DURATION, *scan_params), deep_scan,
+                   "🧠 AI Deep Scan in Progress...", widget_key="deep_scan")
+    if scan is None:
+        st.stop()
+    preds, avg_pred, timeline = scan
+    y = record.signal(SR, MAX_AUDIO_DURATION)
+    # One STFT per track: the map the model saw (chunk mels are only built on an analysis-cache miss)
+    mel_full = record.logmel(MAX_AUDIO_DURATION) if sliding else record.chunk_map(NUM_CHUNKS, MAX_AUDIO_DURATION)
+    
+    # Visualize (reduced to screen resolution; images are cached per song and size)
+    with span("plot"):
+        if array_charts:
+            wave_chart, mel_chart = waveform_chart_spec(y), mel_chart_spec(mel_full)
+        else:
+            wave_png, mel_png = cached_visuals(record.digest, y, mel_full)
+    v_col1, v_col2 = st.columns(2)
+    with v_col1:
+        st.markdown("<p style='color:#888; text-align:center;'>Waveform Signature</p>", unsafe_allow_html=True)
+        if array_charts:
+            st.vega_lite_chart(wave_chart, use_container_width=True, theme=None)
+        else:
+            st.image(wave_png, use_container_width=True)
+    with v_col2:
+        st.markdown("<p style='color:#888; text-align:center;'>Spectral Mel-Map</p>", unsafe_allow_html=True)
+        if array_charts:
+            st.vega_lite_chart(mel_chart, use_container_width=True, theme=None)
+        else:
+            st.image(mel_png, use_container_width=True)
 
-        avg_pred = np.mean(preds, axis=0)
-        final_idx = int(np.argmax(avg_pred))
-        res_emo = EMOTION_CLASSES[final_idx]
-        res_conf = avg_pred[final_idx]
+    final_idx = int(np.argmax(avg_pred))
+    res_emo = EMOTION_CLASSES[final_idx]
+    res_conf = avg_pred[final_idx]
 
     # --- RESULTS DISPLAY ---
     st.markdown("<br><hr style='border: 0; height: 1px; background: linear-gradient(to right, transparent, rgba(255,215,0,0.3), transparent);'>", unsafe_allow_html=True)
@@ -300,10 +288,9 @@ else:
                     <span style="float:right; background: rgba(255,215,0,0.1); color: #ffd700; padding: 2px 10px; border-radius: 20px; font-size: 0.8rem;">Duration: {duration:.1f}s</span>
                 </div>
                 """, unsafe_allow_html=True)
-                seg_audio = y[int(start*SR):int(end*SR)]
-                buf = io.BytesIO()
-                sf.write(buf, seg_audio, SR, format="WAV")
-                st.audio(buf.getvalue())
+                # A time range of the original upload: no re-encode, and every player shares one stored file.
+                # Streamlit plays whole seconds, so widen the range outwards rather than clip the segment.
+                st.audio(audio_bytes, format=audio_mime, start_time=math.floor(start), end_time=math.ceil(end))
 
 # FOOTER
 st.markdown("<br><hr style='border: 0; height: 1px; background: linear-gradient(to right, transparent, rgba(255,215,0,0.3), transparent);'>", unsafe_allow_html=True)
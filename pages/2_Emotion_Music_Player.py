@@ -5,29 +5,23 @@
 
 import streamlit as st
 import numpy as np
-import tensorflow as tf
-import librosa
-import os
-import pandas as pd
 from pathlib import Path
 import time
 import textwrap
+from utils.inference import EMOTION_CLASSES, EARLY_EXIT_MARGIN, top_emotion
+from utils.pipeline import pipelined_scan
+from utils.cache import get_cache, model_identity, audio_digest
+from utils.backends import DEFAULT_BACKEND
+from utils.model_loader import load_emotion_model
+from utils.feedback import get_feedback_store
+from utils.spool import get_spool
+from utils.jobs import run_job
+from utils.timing import span, diagnostics_panel
 
 # ====================== 1. CONFIG ======================
-SR = 44100
-N_MELS = 128
-N_FFT = 2048
-HOP_LENGTH = 1024
 MAX_AUDIO_DURATION = 100
-TARGET_FRAMES = 431
-
-EMOTION_CLASSES = ["Calm", "Energetic", "Happy", "Romantic", "Sad"]
 EMO_ICONS = {"Calm": "🍃", "Energetic": "🔥", "Happy": "😊", "Romantic": "💖", "Sad": "🥺"}
 
-TEMP_DIR = Path("temp_audio")
-if not TEMP_DIR.exists():
-    TEMP_DIR.mkdir(parents=True, exist_ok=True)
-
 # ====================== 2. PAGE & PREMIUM CSS ======================
 st.set_page_config(
     page_title="Sinhala Emotion Music Player",
@@ -163,46 +157,43 @@ st.markdown("<h1 class='main-title'>🎧 Sinhala Song Emotion AI </h1>", unsafe_
 st.markdown("<p class='sub-title'>Emotion-Based Intelligence</p>", unsafe_allow_html=True)
 st.markdown("<hr style='border: 0; height: 1px; background: linear-gradient(to right, transparent, rgba(255,215,0,0.3), transparent);'>", unsafe_allow_html=True)
 # ====================== 3. MODEL ======================
-@st.cache_resource
-def load_model(path: str):
-    return tf.keras.models.load_model(path)
-
 with st.sidebar:
     st.markdown("<h3 style='color:#ffd700; margin-bottom:10px;'>🧠 AI Engine</h3>", unsafe_allow_html=True)
     model_path = st.text_input("Model File", "mobileNetV2.keras")
     try:
-        model = load_model(model_path)
+        model = load_emotion_model(model_path, DEFAULT_BACKEND)
         st.success("AI Engine Ready")
     except:
         st.error("Model Not Found")
         st.stop()
 
 # ====================== 4. HELPERS ======================
-def extract_logmel(y):
-    mel = librosa.feature.melspectrogram(y=y, sr=SR, n_mels=N_MELS, n_fft=N_FFT, hop_length=HOP_LENGTH)
-    return librosa.power_to_db(mel, ref=np.max).astype(np.float32)
-
-def classify_song(path):
-    y, _ = librosa.load(path, sr=SR, mono=True, duration=MAX_AUDIO_DURATION)
-    if len(y) < TARGET_FRAMES: y = np.pad(y, (0, TARGET_FRAMES - len(y)))
-    mel = extract_logmel(y)
-    chunks = []
-    hop = TARGET_FRAMES
-    for start in range(0, mel.shape[1], hop):
-        end = start + TARGET_FRAMES
-        segment = mel[:, start:end]
-        if segment.shape[1] < TARGET_FRAMES:
-            segment = np.pad(segment, ((0,0),(0,TARGET_FRAMES - segment.shape[1])))
-        chunks.append(segment)
-    preds = []
-    for seg in chunks:
-        seg = (seg - seg.mean()) / (seg.std() + 1e-6)
-        x = np.repeat(np.expand_dims(seg, axis=-1), 3, axis=-1)
-        x = np.expand_dims(x, axis=0)
-        preds.append(model.predict(x, verbose=0)[0])
-    avg_pred = np.mean(preds, axis=0)
-    final_idx = int(np.argmax(avg_pred))
-    return EMOTION_CLASSES[final_idx], float(avg_pred[final_idx])
+def song_cache_key(audio_hash):
+    params = {"early_exit": early_exit} if early_exit is not None else {}
+    return get_cache().key(audio_hash, model=model_identity(model_path), mode="windows", duration=scan_duration, **params)
+
+def scan_library(files, job):
+    # Runs as a background job. Cache hits are resolved up front; the rest go through the decode/inference pipeline
+    results = [None] * len(files)
+    misses = []
+    for i, (_, _, key) in enumerate(files):
+        cached = get_cache().get(key)
+        if cached is not None:
+            results[i] = top_emotion(cached[1])
+        else:
+            misses.append(i)
+    done = len(files) - len(misses)
+    job.report(done / len(files), f"🎧 Scanned {done}/{len(files)} songs")
+
+    counts = {}
+    scan = pipelined_scan(model, [files[i][1] for i in misses], scan_duration, early_exit=early_exit, counts=counts)
+    for i, result in zip(misses, scan):
+        job.check_cancelled()
+        result = get_cache().put(files[i][2], result)
+        results[i] = top_emotion(result[1])
+        done += 1
+        job.report(done / len(files), f"🎧 Scanned {done}/{len(files)} songs")
+    return results, counts
 
 
 # ====================== 5. SIDEBAR OPTIONS (Reset & Data Management) ======================
@@ -210,30 +201,50 @@ with st.sidebar:
     st.markdown("<hr style='border: 0; height: 1px; background: linear-gradient(to right, transparent, rgba(255,215,0,0.3), transparent);'>", unsafe_allow_html=True)
     st.markdown("<h3 style='color:#ffd700;'>📊 System Options</h3>", unsafe_allow_html=True)
 
+    # Full-length scans stream the file in blocks instead of reading only the first 100 s
+    full_length = st.checkbox("Full-length analysis", value=False, help="Analyse whole tracks (live recordings, mixes) at constant memory")
+    scan_duration = None if full_length else MAX_AUDIO_DURATION
+
+    # Stop classifying a song once the windows seen so far agree clearly enough
+    fast_scan = st.checkbox("Fast scan (early exit)", value=False, help="Skip the remaining windows of a song once its label is clear")
+    early_exit = st.slider("Decision margin", 0.05, 0.9, EARLY_EXIT_MARGIN, 0.05,
+                           help="Top-two probability gap needed to stop early") if fast_scan else None
+    scan_counts = st.session_state.get("scan_counts")
+    if "library" in st.session_state and scan_counts and scan_counts.get("windows"):
+        saved = scan_counts["windows"] - scan_counts["evaluated"]
+        st.caption(f"⚡ Last scan skipped {saved} of {scan_counts['windows']} windows ({saved / scan_counts['windows']:.0%})")
+
     # --- 1. Reset Music Library (අලුත් සින්දු දාන්න පරණ ඒවා අයින් කරන බටන් එක) ---
     if "library" in st.session_state:
         if st.button("🗑️ Reset Music Library", key="reset_lib_btn", use_container_width=True, help="Clear current songs and upload new ones"):
             if "library" in st.session_state: del st.session_state.library
             if "current_index" in st.session_state: del st.session_state.current_index
+            if "scan_counts" in st.session_state: del st.session_state.scan_counts
+            get_spool().release()
             st.rerun()
 
     # --- 2. Data Download & Flush (CSV එක මකන කොටස) ---
-    responses_file = "responses.csv"
-    if os.path.exists(responses_file):
-        with open(responses_file, "rb") as f:
-            csv_data = f.read()
-            
+    feedback = get_feedback_store()
+    if feedback.count():
+        # Agreement per AI label comes from the store's running totals, not a file scan
+        agreement = feedback.agreement()
+        st.dataframe(
+            [{"Emotion": ai, "Responses": a["total"], "Agreement": f"{a['rate']:.0%}"} for ai, a in agreement.items()],
+            hide_index=True, use_container_width=True
+        )
+
+        # The CSV is only generated when the button is clicked
         st.download_button(
             label="📥 Download CSV Data",
-            data=csv_data,
+            data=feedback.export_csv,
             file_name="song_feedback.csv",
             mime="text/csv",
             use_container_width=True,
             key="dl_csv"
         )
         
-        if st.button("🔴 Clear Saved Feedbacks", key="clear_csv_btn", use_container_width=True, help="Permanently delete the feedback CSV file"):
-            os.remove(responses_file)
+        if st.button("🔴 Clear Saved Feedbacks", key="clear_csv_btn", use_container_width=True, help="Permanently delete all saved feedback"):
+            feedback.clear()
             st.success("Database Flushed!")
             time.sleep(1)
             st.rerun()
@@ -242,6 +253,8 @@ with st.sidebar:
 
     st.markdown("<hr style='border: 0; height: 1px; background: linear-gradient(to right, transparent, rgba(255,215,0,0.3), transparent);'>", unsafe_allow_html=True)
 
+diagnostics_panel()
+
 # ====================== 6. UPLOADER ======================
 if "library" not in st.session_state:
     st.markdown("""
@@ -255,24 +268,38 @@ if "library" not in st.session_state:
     
     if uploaded_files:
         if st.button("🚀 START AI SCAN", use_container_width=True):
+            # Spooled by content hash: same bytes are stored once, and this session pins them until reset
+            get_spool().release()
+            files = []
+            for uploaded_file in uploaded_files:
+                with span("upload_read"):
+                    data = uploaded_file.getbuffer()
+                    # Plain hash: an AnalysisRecord per song would push other pages' records out of the shared LRU
+                    digest = audio_digest(data)
+                    file_path = get_spool().put(data, Path(uploaded_file.name).suffix, digest=digest)
+                files.append((uploaded_file.name, str(file_path), song_cache_key(digest)))
+            st.session_state.scan_files = files
+
+    # The scan runs on the shared job pool, so reruns (and widget clicks) don't restart it
+    if "scan_files" in st.session_state:
+        files = st.session_state.scan_files
+        scan_key = ("library_scan", tuple(key for _, _, key in files))
+        scan = run_job(scan_key, lambda job: scan_library(files, job), "🎧 Scanning library...", widget_key="library_scan")
+        if scan is not None:
+            results, counts = scan
             library = {e: [] for e in EMOTION_CLASSES}
-            progress_bar = st.progress(0)
-            
-            for i, uploaded_file in enumerate(uploaded_files):
-                file_path = TEMP_DIR / uploaded_file.name
-                with open(file_path, "wb") as f:
-                    f.write(uploaded_file.getbuffer())
-                
-                emo, conf = classify_song(str(file_path))
-                library[emo].append({"name": Path(uploaded_file.name).stem, "path": str(file_path), "confidence": conf})
-                progress_bar.progress((i + 1) / len(uploaded_files))
+            for (name, path, _), (emo, conf) in zip(files, results):
+                library[emo].append({"name": Path(name).stem, "path": path, "confidence": conf})
 
+            del st.session_state.scan_files
             st.session_state.library = library
             st.session_state.current_index = {e: 0 for e in EMOTION_CLASSES}
+            st.session_state.scan_counts = counts
             st.rerun()
 
 # ====================== 7. PLAYER UI ======================
 if "library" in st.session_state:
+    get_spool().touch()
 
     tabs = st.tabs([f"{EMO_ICONS[e]} {e}" for e in EMOTION_CLASSES])
 
@@ -360,9 +387,8 @@ if "library" in st.session_state:
 
                     if submit_btn:
                         if u_name and u_actual != "Select...":
-                            result = "Matched" if emo == u_actual else "Not Matched"
-                            df = pd.DataFrame([{"Song": song['name'], "AI": emo, "User": u_actual, "Name": u_name, "Result": result, "Date": time.strftime("%Y-%m-%d %H:%M")}])
-                            df.to_csv("responses.csv", mode='a', header=not os.path.exists("responses.csv"), index=False)
+                            with span("feedback_write"):
+                                get_feedback_store().add(song['name'], emo, u_actual, u_name)
                 
                             #st.balloons() 
                             st.success(f"Thank you {u_name}! Your response has been recorded.")
@@ -1,8 +1,12 @@
 import streamlit as st
-import librosa
 import numpy as np
-import json
+import pandas as pd
 import time
+from utils.analysis_record import get_record, song_personality
+from utils.cache import audio_digest
+from utils.personality import TRAITS, normalize, level, compute_big_five, playlist_profile
+from utils.timing import span, diagnostics_panel
+from utils.jobs import run_job
 
 # ==============================
 # CONFIG (Must be first)
@@ -13,10 +17,6 @@ st.set_page_config(
     layout="wide"
 )
 
-SR = 22050 
-REFERENCE_PATH = "feature_reference.json"
-MAX_AUDIO_DURATION = 90
-
 # CSS for Glassmorphism and Buttons
 st.markdown("""
 <style>
@@ -77,134 +77,6 @@ section[data-testid="stSidebar"] {
 </style>
 """, unsafe_allow_html=True)
 
-# ==============================
-# REFERENCE DATA 
-# ==============================
-try:
-    with open(REFERENCE_PATH, "r") as f:
-        FEATURE_REF = json.load(f)
-except FileNotFoundError:
-    FEATURE_REF = {
-        "tempo_bpm": {"min": 51.6796875, "max": 215.33203125},
-        "loudness_db": {"min": -21.87506, "max": -3.8104322},
-        "timbre_spectral_centroid": {"min": 820.41504892454, "max": 4050.5376104961033}
-    }
-
-# ==============================
-# LOGIC FUNCTIONS
-# ==============================
-def extract_features(audio_file):
-    # ===============================
-    # 1. Load Audio
-    # ===============================
-    y, sr = librosa.load(audio_file, sr=SR, duration=MAX_AUDIO_DURATION)
-
-    if len(y) == 0:
-        raise ValueError("Audio file is empty or too short.")
-
-    # ===============================
-    # 2. Robust Multi-Tempo Detection
-    # ===============================
-    onset_env = librosa.onset.onset_strength(y=y, sr=sr)
-
-    # Get multiple tempo candidates
-    tempo_candidates = librosa.beat.tempo(
-        onset_envelope=onset_env,
-        sr=sr,
-        aggregate=None
-    )
-
-    tempo_candidates = np.array(tempo_candidates)
-
-    # Remove unrealistic extremes
-    tempo_candidates = tempo_candidates[
-        (tempo_candidates > 40) & (tempo_candidates < 200)
-    ]
-
-    # Normalize into 60–180 BPM range
-    normalized_tempos = []
-    for t in tempo_candidates:
-        while t < 60:
-            t *= 2
-        while t > 180:
-            t /= 2
-        normalized_tempos.append(t)
-
-    normalized_tempos = np.array(normalized_tempos)
-
-    # Final tempo = median of normalized candidates
-    tempo = float(np.median(normalized_tempos)) if len(normalized_tempos) > 0 else float(np.mean(tempo_candidates))
-
-    # ===============================
-    # 3. Loudness (RMS → dB)
-    # ===============================
-    rms = librosa.feature.rms(y=y)[0]
-    loudness_db = float(np.mean(librosa.amplitude_to_db(rms, ref=np.max)))
-
-    # ===============================
-    # 4. Timbre (Spectral Centroid)
-    # ===============================
-    spectral_centroid = librosa.feature.spectral_centroid(y=y, sr=sr)
-    timbre = float(np.mean(spectral_centroid))
-
-    # ===============================
-    # 5. Musical Mode (12-Key Tracking)
-    # ===============================
-    chroma = librosa.feature.chroma_stft(y=y, sr=sr)
-    chroma_mean = np.mean(chroma, axis=1)
-
-    major_template = np.array([1, 0, 1, 0, 1, 1, 0, 1, 0, 1, 0, 1])
-    minor_template = np.array([1, 0, 1, 1, 0, 1, 0, 1, 1, 0, 1, 0])
-
-    major_scores = []
-    minor_scores = []
-
-    for i in range(12):
-        rotated = np.roll(chroma_mean, -i)
-        major_scores.append(np.dot(rotated, major_template))
-        minor_scores.append(np.dot(rotated, minor_template))
-
-    # Slight bias toward minor (good for Sinhala emotional songs)
-    if (max(minor_scores) * 1.05) > max(major_scores):
-        mode = "Minor"
-    else:
-        mode = "Major"
-
-    return tempo, loudness_db, timbre, mode
-
-
-
-
-def normalize(value, feature):
-    min_v, max_v = FEATURE_REF[feature]["min"], FEATURE_REF[feature]["max"]
-    return (np.clip(value, min_v, max_v) - min_v) / (max_v - min_v)
-
-def level(norm):
-    return "Low" if norm < 0.5 else "High"
-
-def compute_big_five(feature_levels):
-    traits = ["Extraversion","Agreeableness","Neuroticism","Conscientiousness","Openness"]
-    votes = {k: [] for k in traits}
-    rules = {
-        ("tempo", "High"): {"Extraversion":2,"Agreeableness":1,"Neuroticism":0,"Conscientiousness":1,"Openness":1},
-        ("tempo", "Low"):  {"Extraversion":0,"Agreeableness":1,"Neuroticism":2,"Conscientiousness":1,"Openness":2},
-        ("energy", "High"): {"Extraversion":2,"Agreeableness":0,"Neuroticism":1,"Conscientiousness":1,"Openness":1},
-        ("energy", "Low"):  {"Extraversion":0,"Agreeableness":2,"Neuroticism":2,"Conscientiousness":2,"Openness":2},
-        ("mode", "Major"): {"Extraversion":2,"Agreeableness":2,"Neuroticism":0,"Conscientiousness":1,"Openness":1},
-        ("mode", "Minor"): {"Extraversion":0,"Agreeableness":1,"Neuroticism":2,"Conscientiousness":1,"Openness":2},
-        ("timbre", "High"): {"Extraversion":1,"Agreeableness":0,"Neuroticism":1,"Conscientiousness":0,"Openness":2},
-        ("timbre", "Low"):  {"Extraversion":1,"Agreeableness":2,"Neuroticism":0,"Conscientiousness":2,"Openness":1}
-    }
-    for feat, lvl in feature_levels.items():
-        if (feat, lvl) in rules:
-            for t in traits: votes[t].append(rules[(feat, lvl)][t])
-    results = {}
-    for t, v in votes.items():
-        avg = sum(v)/len(v) if v else 0
-        lbl = "Low" if avg <= 0.67 else "Moderate" if avg <= 1.33 else "High"
-        results[t] = {"level": lbl, "confidence": avg / 2}
-    return results
-
 # ==============================
 # UI COMPONENTS
 # ==============================
@@ -245,13 +117,17 @@ st.markdown("<h1 style='text-align:center;'>🎧 Sinhala Song Emotion AI </h1>",
 st.markdown("<p class ='sub-title'>Analyze the acoustic traits of music to predict listener personality</p>", unsafe_allow_html=True)
 st.markdown("<hr style='border: 0; height: 1px; background: linear-gradient(to right, transparent, rgba(255,215,0,0.3), transparent);'>", unsafe_allow_html=True)
 
+diagnostics_panel()
+
+analysis_mode = st.radio("Analysis mode", ["Single Song", "Playlist"], horizontal=True, label_visibility="collapsed")
+
 # --- SESSION STATE FIX ---
 # Changed 'active_file' to 'active_file_personality' to prevent cross-page conflict
 if 'active_file_personality' not in st.session_state:
     st.session_state.active_file_personality = None
 
 # Show uploader ONLY if no file is active
-if st.session_state.active_file_personality is None:
+if analysis_mode == "Single Song" and st.session_state.active_file_personality is None:
     st.markdown("""
          <div style="background: rgba(255, 215, 0, 0.03); padding: 10px; border-radius: 25px; border: 1px dashed #ffd700; text-align: center;">
             <h2 style="color: #ffd700; margin-bottom:10px;">Drop Your Audio Track</h2>
@@ -265,7 +141,7 @@ if st.session_state.active_file_personality is None:
         st.rerun()
 
 # Processing if file is uploaded
-if st.session_state.active_file_personality is not None:
+if analysis_mode == "Single Song" and st.session_state.active_file_personality is not None:
     uploaded_file = st.session_state.active_file_personality
     
     # Premium Player & Reset Button UI (Updated)
@@ -297,16 +173,22 @@ if st.session_state.active_file_personality is not None:
 
     st.audio(uploaded_file)
 
-    # Trigger Analysis
-    with st.spinner("🧠 AI is extracting acoustic personality features..."):
-        tempo, energy, timbre, mode = extract_features(uploaded_file)
-        f_levels = {
-            "tempo": level(normalize(tempo, "tempo_bpm")),
-            "energy": level(normalize(energy, "loudness_db")),
-            "timbre": level(normalize(timbre, "timbre_spectral_centroid")),
-            "mode": mode
-        }
-        personality = compute_big_five(f_levels)
+    # Trigger Analysis (background job, shared with any other session analysing the same song)
+    with span("upload_read"):
+        audio_bytes = uploaded_file.getvalue()
+    record = get_record(audio_bytes)
+    features = run_job(("personality", record.digest), lambda job: record.personality(),
+                       "🧠 AI is extracting acoustic personality features...", widget_key="personality")
+    if features is None:
+        st.stop()
+    tempo, energy, timbre, mode = features
+    f_levels = {
+        "tempo": level(normalize(tempo, "tempo_bpm")),
+        "energy": level(normalize(energy, "loudness_db")),
+        "timbre": level(normalize(timbre, "timbre_spectral_centroid")),
+        "mode": mode
+    }
+    personality = compute_big_five(f_levels)
 
     st.markdown(f"""
         <hr style='border: 0; height: 1px; background: linear-gradient(to right, transparent, rgba(255,215,0,0.3), transparent);'>
@@ -364,6 +246,110 @@ if st.session_state.active_file_personality is not None:
     </div>
     """, unsafe_allow_html=True)
 
+# ==============================
+# PLAYLIST MODE
+# ==============================
+if analysis_mode == "Playlist":
+    st.markdown("""
+         <div style="background: rgba(255, 215, 0, 0.03); padding: 10px; border-radius: 25px; border: 1px dashed #ffd700; text-align: center;">
+            <h2 style="color: #ffd700; margin-bottom:10px;">Drop Your Playlist</h2>
+            <p style="color: #888;">Every track is profiled and combined into one listener profile.</p>
+        </div>
+    """, unsafe_allow_html=True)
+
+    playlist = st.file_uploader("", type=["mp3", "wav"], accept_multiple_files=True, key="personality_playlist")
+
+    def profile_playlist(job, songs):
+        names, features, failed = [], [], []
+        for i, (name, audio_bytes, digest) in enumerate(songs):
+            job.check_cancelled()
+            try:
+                features.append(song_personality(audio_bytes, digest))
+                names.append(name)
+            except Exception:
+                failed.append(name)
+            job.report((i + 1) / len(songs), f"🧠 Profiled {i + 1}/{len(songs)}: {name}")
+        return names, features, failed
+
+    features = None
+    if playlist:
+        # Read and hash the uploads once per upload set, not on every job-poll rerun
+        upload_ids = tuple(f.file_id for f in playlist)
+        if st.session_state.get("playlist_uploads", {}).get("ids") != upload_ids:
+            with span("upload_read"):
+                songs = [(f.name, data, audio_digest(data)) for f, data in ((f, f.getvalue()) for f in playlist)]
+            st.session_state.playlist_uploads = {
+                "ids": upload_ids,
+                "songs": songs,
+                "key": ("playlist", tuple(digest for _, _, digest in songs)),
+            }
+        uploads = st.session_state.playlist_uploads
+        songs, playlist_key = uploads["songs"], uploads["key"]
+        profiled = run_job(playlist_key, lambda job: profile_playlist(job, songs),
+                           "🧠 Extracting acoustic features...", widget_key="playlist")
+        if profiled is not None:
+            names, features, failed = profiled
+            if failed:
+                st.warning(f"Skipped {len(failed)} unreadable file(s): {', '.join(failed)}")
+    else:
+        st.session_state.pop("playlist_uploads", None)
+
+    if playlist and features:
+        with span("playlist_profile", songs=len(features)):
+            profile, scores = playlist_profile(features)
+        tempos, energies, timbres, modes = zip(*features)
+
+        st.markdown("""
+            <hr style='border: 0; height: 1px; background: linear-gradient(to right, transparent, rgba(255,215,0,0.3), transparent);'>
+                    """, unsafe_allow_html=True)
+
+        col1, col2 = st.columns(2, gap="large")
+        with col1:
+            st.subheader("🎼 Playlist Acoustics")
+            feature_card("Songs", f"{len(features)}", "", "Tracks")
+            feature_card("Median Tempo", float(np.median(tempos)), "BPM", level(normalize(np.median(tempos), "tempo_bpm")))
+            feature_card("Median Energy", float(np.median(energies)), "dB", level(normalize(np.median(energies), "loudness_db")))
+            feature_card("Median Timbre", float(np.median(timbres)), "Hz", level(normalize(np.median(timbres), "timbre_spectral_centroid")))
+            minor_share = modes.count("Minor") / len(modes)
+            feature_card("Minor Key Share", f"{minor_share:.0%}", "", "Minor" if minor_share >= 0.5 else "Major")
+
+        with col2:
+            st.subheader("🧠 Listener Profile")
+            for trait, data in profile.items():
+                personality_card(trait, data)
+
+        # Each song's share of the profile: its confidence / number of songs, so columns sum to the profile
+        st.subheader("🎶 Per-Song Contributions")
+        contributions = pd.DataFrame(scores / 2 / len(scores) * 100, columns=TRAITS)
+        contributions.insert(0, "Song", names)
+        contributions.insert(1, "Mode", modes)
+        contributions.insert(1, "Tempo (BPM)", np.round(tempos, 1))
+        st.dataframe(contributions, hide_index=True, use_container_width=True,
+                     column_config={t: st.column_config.NumberColumn(t, format="%.2f pts") for t in TRAITS})
+
+        summary_parts = [f"<b style='color:#ffd700;'>{data['level'].lower()} {trait}</b>" for trait, data in profile.items()]
+        full_traits_str = ", ".join(summary_parts[:-1]) + " and " + summary_parts[-1]
+        st.markdown(f"""
+        <hr style='border: 0; height: 1px; background: linear-gradient(to right, transparent, rgba(255,215,0,0.3), transparent);'>
+        <div style="
+            background: linear-gradient(145deg, rgba(255, 215, 0, 0.05), rgba(0, 0, 0, 0.1));
+            padding: 25px;
+            border-radius: 20px;
+            border-left: 5px solid #ffd700;
+            box-shadow: 0 4px 15px rgba(255, 215, 0, 0.1);
+            text-align: left;
+            margin: 20px 0;
+            backdrop-filter: blur(10px);
+        ">
+            <h6 style="color: #ffd700; font-size: 0.8rem; letter-spacing: 2px; text-transform: uppercase; margin: 0 0 10px 0;">
+                ✨ AI Listener Profile (Big Five)
+            </h6>
+            <p style="margin: 0; font-size: 1.05rem; color: #ffffff; line-height: 1.7; font-style: italic;">
+                "Across these {len(features)} songs, your musical taste suggests a profile characterized by {full_traits_str}."
+            </p>
+        </div>
+        """, unsafe_allow_html=True)
+
 # FOOTER
 st.markdown("<br><hr style='border: 0; height: 1px; background: linear-gradient(to right, transparent, rgba(255,215,0,0.3), transparent);'>", unsafe_allow_html=True)
 st.markdown("""
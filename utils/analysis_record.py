@@ -0,0 +1,128 @@
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import librosa
+
+from utils.audio_utils import SR, chunk_power_mel, extract_logmel, extract_logmel_chunks, get_front_end
+from utils.cache import get_cache, audio_digest
+from utils.inference import NUM_CHUNKS, HOP_SECONDS, analyze_chunks, analyze_sliding
+from utils.personality import (SR as FEATURE_SR, MAX_AUDIO_DURATION as FEATURE_DURATION, extract_features,
+                               extract_features_from_signal)
+from utils.timing import span
+
+BASE_DURATION = 100
+MAX_RECORDS = 8
+
+class AnalysisRecord:
+    """Everything derived from one song's bytes, computed on first access and shared by all pages.
+
+    The audio is decoded once at SR for BASE_DURATION seconds; other sample
+    rates and shorter durations are derived from that signal. Emotion
+    probabilities and personality features also go through the on-disk
+    analysis cache, so they survive restarts.
+    """
+
+    def __init__(self, data, digest=None):
+        self.data = data
+        self.digest = digest or audio_digest(data)
+        self._lock = threading.RLock()
+        self._signals = {}
+        self._results = {}
+
+    def source(self):
+        return io.BytesIO(self.data)
+
+    def signal(self, sr=SR, duration=BASE_DURATION):
+        with self._lock:
+            key = (sr, duration)
+            if key not in self._signals:
+                if duration is None or duration > BASE_DURATION:
+                    with span("decode"):
+                        y, _ = librosa.load(self.source(), sr=sr, mono=True, duration=duration)
+                elif sr == SR and duration == BASE_DURATION:
+                    with span("decode"):
+                        y, _ = librosa.load(self.source(), sr=SR, mono=True, duration=BASE_DURATION)
+                else:
+                    base = self.signal(SR, BASE_DURATION)[:int(duration * SR)]
+                    y = base if sr == SR else librosa.resample(base, orig_sr=SR, target_sr=sr)
+                self._signals[key] = y
+            return self._signals[key]
+
+    def _memo(self, key, compute):
+        with self._lock:
+            if key not in self._results:
+                self._results[key] = compute()
+            return self._results[key]
+
+    def chunk_power(self, num_chunks=NUM_CHUNKS, duration=BASE_DURATION):
+        return self._memo(("chunk_power", num_chunks, duration),
+                          lambda: chunk_power_mel(self.signal(SR, duration), num_chunks))
+
+    def chunk_map(self, num_chunks=NUM_CHUNKS, duration=BASE_DURATION):
+        """The chunks' power maps joined, in dB: the spectrogram of what analyze_chunks sees, no extra STFT."""
+        return self._memo(("chunk_map", num_chunks, duration),
+                          lambda: get_front_end().to_db(self.chunk_power(num_chunks, duration).copy()))
+
+    def logmel_chunks(self, num_chunks=NUM_CHUNKS, duration=BASE_DURATION):
+        return self._memo(("logmel_chunks", num_chunks, duration), lambda: extract_logmel_chunks(
+            None, num_chunks, power=self.chunk_power(num_chunks, duration)))
+
+    def emotion(self, model, model_id, num_chunks=NUM_CHUNKS, duration=BASE_DURATION):
+        """(preds, avg_pred, timeline) for equal chunks, as returned by inference.analyze_chunks."""
+        def compute():
+            key = get_cache().key(self.digest, model=model_id, mode="chunks", num_chunks=num_chunks, duration=duration)
+            preds, avg_pred, timeline = get_cache().get_or_compute(key, lambda: analyze_chunks(
+                model, self.signal(SR, duration), num_chunks, mels=self.logmel_chunks(num_chunks, duration)[1]))
+            return np.asarray(preds), np.asarray(avg_pred), [tuple(t) for t in timeline]
+        return self._memo(("emotion", model_id, num_chunks, duration), compute)
+
+    def logmel(self, duration=BASE_DURATION):
+        """Full-track log-mel in one STFT (dB against the track maximum), the input of sliding windows."""
+        return self._memo(("logmel", duration), lambda: extract_logmel(self.signal(SR, duration)))
+
+    def sliding_emotion(self, model, model_id, window_seconds=None, hop_seconds=HOP_SECONDS, duration=BASE_DURATION):
+        """(preds, avg_pred, timeline) for overlapping windows, as returned by inference.analyze_sliding."""
+        def compute():
+            key = get_cache().key(self.digest, model=model_id, mode="sliding", window_seconds=window_seconds,
+                                  hop_seconds=hop_seconds, duration=duration)
+            preds, avg_pred, timeline = get_cache().get_or_compute(key, lambda: analyze_sliding(
+                model, window_seconds=window_seconds, hop_seconds=hop_seconds, mel=self.logmel(duration)))
+            return np.asarray(preds), np.asarray(avg_pred), [tuple(t) for t in timeline]
+        return self._memo(("sliding_emotion", model_id, window_seconds, hop_seconds, duration), compute)
+
+    def personality(self):
+        """(tempo, loudness_db, timbre, mode) as returned by personality.extract_features."""
+        def compute():
+            return tuple(get_cache().get_or_compute(personality_key(self.digest), lambda: extract_features_from_signal(
+                self.signal(FEATURE_SR, FEATURE_DURATION), FEATURE_SR)))
+        return self._memo(("personality",), compute)
+
+def personality_key(digest):
+    return get_cache().key(digest, mode="personality", feature_sr=FEATURE_SR, duration=FEATURE_DURATION)
+
+def song_personality(data, digest=None):
+    """Personality features of audio bytes through the analysis cache, without an AnalysisRecord.
+
+    For songs that are only profiled (playlists): the audio is decoded
+    straight at FEATURE_SR for FEATURE_DURATION and nothing stays resident.
+    Shares its cache entry with AnalysisRecord.personality().
+    """
+    key = personality_key(digest or audio_digest(data))
+    return tuple(get_cache().get_or_compute(key, lambda: extract_features(io.BytesIO(data))))
+
+_records = OrderedDict()
+_records_lock = threading.Lock()
+
+def get_record(data):
+    """The shared record for these audio bytes (LRU over MAX_RECORDS songs per process)."""
+    digest = audio_digest(data)
+    with _records_lock:
+        record = _records.get(digest)
+        if record is None:
+            record = _records[digest] = AnalysisRecord(data, digest)
+        _records.move_to_end(digest)
+        while len(_records) > MAX_RECORDS:
+            _records.popitem(last=False)
+        return record
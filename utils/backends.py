@@ -0,0 +1,85 @@
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+BACKENDS = ["keras", "tflite-fp16", "tflite-int8"]
+DEFAULT_BACKEND = os.environ.get("EMOTION_BACKEND", "keras")
+
+class KerasBackend:
+    name = "keras"
+
+    def __init__(self, path):
+        import tensorflow as tf
+        self.path = str(path)
+        self.model = tf.keras.models.load_model(path)
+
+    def predict(self, batch, batch_size=32, verbose=0):
+        return self.model.predict(batch, batch_size=batch_size, verbose=verbose)
+
+class TFLiteBackend:
+    """TFLite interpreter with the same predict() call shape as a Keras model.
+
+    The interpreter is not thread-safe and one instance is shared by every
+    session through the model registry, so predict() runs under a lock.
+    """
+
+    def __init__(self, path, name="tflite", num_threads=None):
+        import tensorflow as tf
+        self.path = str(path)
+        self.name = name
+        self.interpreter = tf.lite.Interpreter(model_path=self.path, num_threads=num_threads)
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch = None
+        self._lock = threading.Lock()
+
+    def predict(self, batch, batch_size=32, verbose=0):
+        batch = np.ascontiguousarray(batch, dtype=self._input["dtype"])
+        with self._lock:
+            # Resize once per distinct batch length; the interpreter keeps the plan between calls
+            if self._batch != len(batch):
+                self.interpreter.resize_tensor_input(self._input["index"], batch.shape)
+                self.interpreter.allocate_tensors()
+                self._batch = len(batch)
+            self.interpreter.set_tensor(self._input["index"], batch)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self._output["index"]).copy()
+
+def tflite_path(keras_path, quantization):
+    p = Path(keras_path)
+    return p.with_name(f"{p.stem}.{quantization}.tflite")
+
+def convert_to_tflite(keras_path, quantization="fp16", out_path=None):
+    """Convert the Keras model to TFLite with float16 or dynamic-range int8 weights."""
+    import tensorflow as tf
+    model = tf.keras.models.load_model(keras_path)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == "fp16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization != "int8":
+        raise ValueError(f"Unknown quantization: {quantization}")
+    out_path = Path(out_path or tflite_path(keras_path, quantization))
+    # Unique per thread as well as per process: sessions may convert concurrently
+    tmp = out_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(converter.convert())
+    os.replace(tmp, out_path)
+    return out_path
+
+def ensure_converted(path, backend):
+    """Path of the .tflite file for a TFLite backend, (re)converting it if missing or older than the .keras file."""
+    if backend not in BACKENDS or backend == "keras":
+        raise ValueError(f"Not a TFLite backend: {backend} (expected one of {', '.join(BACKENDS[1:])})")
+    quantization = backend.split("-", 1)[1]
+    lite = tflite_path(path, quantization)
+    if not lite.exists() or lite.stat().st_mtime < Path(path).stat().st_mtime:
+        convert_to_tflite(path, quantization, lite)
+    return lite
+
+def load_backend(path, backend=DEFAULT_BACKEND, num_threads=None):
+    """Load the emotion model behind the requested backend ("keras", "tflite-fp16" or "tflite-int8")."""
+    if backend == "keras":
+        return KerasBackend(path)
+    return TFLiteBackend(ensure_converted(path, backend), name=backend, num_threads=num_threads)
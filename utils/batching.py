@@ -0,0 +1,178 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from utils.timing import record
+
+MICROBATCH = os.environ.get("EMOTION_MICROBATCH", "1") != "0"
+MAX_BATCH = int(os.environ.get("EMOTION_MAX_BATCH", 32))
+MAX_WAIT_MS = float(os.environ.get("EMOTION_MAX_WAIT_MS", 10))
+IDLE_SECONDS = 300  # a batcher with no requests for this long stops its thread and drops the model
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+class BatcherClosed(RuntimeError):
+    pass
+
+class MicroBatcher:
+    """One inference thread per model that merges concurrent predict calls.
+
+    Callers from any session thread hand in (N, 128, 431, 3) batches and block
+    on a future. The worker takes the oldest request, then keeps adding
+    queued requests (whole, in arrival order) until the merged batch would
+    exceed max_batch rows or max_wait_ms has passed since that oldest request
+    arrived, runs one model.predict and slices the rows back out to each
+    caller. A request larger than max_batch runs on its own. The wait is
+    skipped while there is no concurrency (the previous batch and the queue
+    held a single request), so a lone user pays no extra latency.
+    """
+
+    def __init__(self, model, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1e3
+        self._cond = threading.Condition()
+        self._queue = deque()  # (arrival time, batch, future)
+        self._queued_rows = 0
+        self._closed = False
+        self._last_requests = 0
+        self._metrics = {"requests": 0, "rows": 0, "batches": 0, "max_queue_depth": 0, "max_queue_rows": 0}
+        self._sizes = dict.fromkeys(SIZE_BUCKETS, 0)
+        self._thread = threading.Thread(target=self._run, name="emotion-microbatch", daemon=True)
+        self._thread.start()
+
+    def submit(self, batch):
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise BatcherClosed("MicroBatcher is closed")
+            self._queue.append((time.perf_counter(), batch, future))
+            self._queued_rows += len(batch)
+            m = self._metrics
+            m["max_queue_depth"] = max(m["max_queue_depth"], len(self._queue))
+            m["max_queue_rows"] = max(m["max_queue_rows"], self._queued_rows)
+            self._cond.notify()
+        return future
+
+    def predict(self, batch):
+        return self.submit(batch).result()
+
+    def _take(self):
+        """Block for the next micro-batch: a list of (arrival, batch, future)."""
+        with self._cond:
+            while not self._queue:
+                if self._closed:
+                    return None
+                if not self._cond.wait(IDLE_SECONDS) and not self._queue:
+                    self._retire()
+            group = [self._queue.popleft()]
+            rows = len(group[0][1])
+            # Only wait for stragglers when several callers have been active
+            deadline = group[0][0] + (self.max_wait if self._queue or self._last_requests > 1 else 0)
+            while rows < self.max_batch:
+                if self._queue:
+                    if rows + len(self._queue[0][1]) > self.max_batch:
+                        break
+                    group.append(self._queue.popleft())
+                    rows += len(group[-1][1])
+                    continue
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0 or self._closed:
+                    break
+                self._cond.wait(remaining)
+            self._queued_rows -= rows
+            self._last_requests = len(group)
+            return group
+
+    def _run(self):
+        while True:
+            group = self._take()
+            if group is None:
+                return
+            rows = sum(len(batch) for _, batch, _ in group)
+            start = time.perf_counter()
+            try:
+                merged = group[0][1] if len(group) == 1 else np.concatenate([batch for _, batch, _ in group])
+                preds = np.asarray(self.model.predict(merged, batch_size=self.max_batch, verbose=0))
+            except Exception as e:
+                for _, _, future in group:
+                    future.set_exception(e)
+                continue
+            record("microbatch", time.perf_counter() - start, rows=rows, requests=len(group),
+                   queue_ms=round((start - group[0][0]) * 1e3, 3))
+            offset = 0
+            for _, batch, future in group:
+                future.set_result(preds[offset:offset + len(batch)])
+                offset += len(batch)
+            with self._cond:
+                m = self._metrics
+                m["requests"] += len(group)
+                m["rows"] += rows
+                m["batches"] += 1
+                bucket = next((b for b in SIZE_BUCKETS if rows <= b), SIZE_BUCKETS[-1])
+                self._sizes[bucket] += 1
+
+    def _retire(self):
+        # Called with self._cond held; get_batcher() starts a fresh batcher if the model is used again
+        self._closed = True
+        with _batchers_lock:
+            if _batchers.get(id(self.model)) is self:
+                del _batchers[id(self.model)]
+
+    def close(self):
+        """Finish what is queued, then stop the worker thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def stats(self):
+        with self._cond:
+            m = dict(self._metrics)
+            m["queue_depth"] = len(self._queue)
+            m["queue_rows"] = self._queued_rows
+            m["mean_batch_rows"] = m["rows"] / m["batches"] if m["batches"] else 0.0
+            m["mean_batch_requests"] = m["requests"] / m["batches"] if m["batches"] else 0.0
+            m["batch_rows_hist"] = {f"<={b}": n for b, n in self._sizes.items() if n}
+        return m
+
+_batchers = {}  # id(model) -> MicroBatcher
+_batchers_lock = threading.Lock()
+
+def get_batcher(model):
+    """The shared MicroBatcher for model, started on first use."""
+    with _batchers_lock:
+        batcher = _batchers.get(id(model))
+        if batcher is not None and batcher.model is model:
+            return batcher
+        stale, batcher = batcher, MicroBatcher(model)
+        _batchers[id(model)] = batcher
+    if stale is not None:
+        stale.close()
+    return batcher
+
+def release_batcher(model):
+    """Stop and forget model's batcher (e.g. when the model is unloaded)."""
+    with _batchers_lock:
+        batcher = _batchers.get(id(model))
+        if batcher is None or batcher.model is not model:
+            return
+        del _batchers[id(model)]
+    batcher.close()
+
+def predict(model, batch):
+    """model.predict(batch) through model's shared batcher."""
+    while True:
+        try:
+            return get_batcher(model).predict(batch)
+        except BatcherClosed:
+            continue  # retired or released between lookup and submit; the next lookup starts a new one
+
+def stats():
+    """One row of metrics per live batcher."""
+    with _batchers_lock:
+        batchers = list(_batchers.values())
+    return [{"model": getattr(b.model, "name", type(b.model).__name__), **b.stats()} for b in batchers]
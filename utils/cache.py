@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from utils.audio_utils import SR, N_MELS, N_FFT, HOP_LENGTH, TARGET_FRAMES
+from utils.backends import DEFAULT_BACKEND
+
+CACHE_DIR = Path(".analysis_cache")
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+def audio_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+def model_identity(path, backend=DEFAULT_BACKEND):
+    # Resolved path + mtime + size, so retraining the same filename invalidates old entries;
+    # the backend is part of it because quantized outputs differ slightly from Keras
+    p = Path(path)
+    try:
+        st = p.stat()
+    except OSError:
+        return f"{path}:{backend}"
+    return f"{p.resolve()}:{st.st_mtime_ns}:{st.st_size}:{backend}"
+
+def _to_json(obj):
+    # numpy arrays and scalars
+    return obj.tolist()
+
+class AnalysisCache:
+    """Content-addressed JSON store on disk, bounded by total size with LRU eviction.
+
+    Recency is the file mtime, refreshed on every hit, so it survives restarts
+    and is shared by every process pointing at the same directory.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def key(self, audio_hash, **params):
+        params = {"sr": SR, "n_mels": N_MELS, "n_fft": N_FFT, "hop_length": HOP_LENGTH,
+                  "target_frames": TARGET_FRAMES, **params}
+        blob = json.dumps({"audio": audio_hash, **params}, sort_keys=True)
+        return hashlib.sha256(blob.encode()).hexdigest()
+
+    def _path(self, key):
+        return self.root / f"{key}.json"
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                value = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key, value):
+        payload = json.dumps(value, default=_to_json)
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "w") as f:
+            f.write(payload)
+        os.replace(tmp, path)
+        self.evict()
+        return json.loads(payload)
+
+    def get_or_compute(self, key, compute):
+        # Values always come back JSON-decoded, hit or miss, so callers see one shape
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, compute())
+        return value
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.root):
+            if entry.name.endswith(".json"):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime_ns, st.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self):
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+        }
+
+_default_cache = None
+
+def get_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = AnalysisCache()
+    return _default_cache
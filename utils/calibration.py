@@ -0,0 +1,138 @@
+import math
+import random
+
+import numpy as np
+
+# Raw personality features that normalize() scales, in extract_features' tuple order
+CALIBRATED_FEATURES = ["tempo_bpm", "loudness_db", "timbre_spectral_centroid"]
+SKETCH_K = 256
+
+class QuantileSketch:
+    """Mergeable streaming quantiles in O(k log(n / k)) memory, plus exact min/max.
+
+    Compactor levels as in KLL/MRL: level h holds items of weight 2**h. When a
+    level reaches k items it is sorted and every other item (random offset) is
+    promoted to the next level. Two sketches merge by concatenating levels and
+    compacting again, so per-worker sketches combine in any order.
+    """
+
+    def __init__(self, k=SKETCH_K, seed=None):
+        self.k = k
+        self.levels = [[]]
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._rng = random.Random(seed)
+
+    def add(self, value):
+        value = float(value)
+        self.levels[0].append(value)
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self.levels[0]) >= self.k:
+            self._compact()
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for h, items in enumerate(other.levels):
+            self.levels[h].extend(items)
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compact()
+        return self
+
+    def _compact(self):
+        h = 0
+        while h < len(self.levels):
+            items = self.levels[h]
+            if len(items) >= self.k:
+                items.sort()
+                # An odd item out stays behind so total weight is conserved exactly
+                keep = [items.pop()] if len(items) % 2 else []
+                if h + 1 == len(self.levels):
+                    self.levels.append([])
+                self.levels[h + 1].extend(items[self._rng.randrange(2)::2])
+                self.levels[h] = keep
+            h += 1
+
+    def quantile(self, q):
+        """Approximate value at quantile q (0..1); q=0 and q=1 are the exact min/max."""
+        if self.count == 0:
+            raise ValueError("empty sketch")
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        values = np.concatenate([np.asarray(items, dtype=float) for items in self.levels])
+        weights = np.concatenate([np.full(len(items), 2.0 ** h) for h, items in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        cumulative = np.cumsum(weights[order])
+        idx = np.searchsorted(cumulative, q * cumulative[-1])
+        return float(values[order][min(idx, len(order) - 1)])
+
+    def to_dict(self):
+        return {"k": self.k, "count": self.count, "min": self.min, "max": self.max, "levels": self.levels}
+
+    @classmethod
+    def from_dict(cls, d):
+        sketch = cls(d["k"])
+        sketch.count, sketch.min, sketch.max = d["count"], d["min"], d["max"]
+        sketch.levels = [list(items) for items in d["levels"]]
+        return sketch
+
+class FeatureSummary:
+    """One QuantileSketch per calibrated feature; what each calibration worker sends back."""
+
+    def __init__(self, k=SKETCH_K):
+        self.sketches = {f: QuantileSketch(k) for f in CALIBRATED_FEATURES}
+
+    def add(self, features):
+        # features: (tempo, loudness_db, timbre, mode) from extract_features
+        for name, value in zip(CALIBRATED_FEATURES, features):
+            if np.isfinite(value):
+                self.sketches[name].add(value)
+
+    def merge(self, other):
+        for name, sketch in other.sketches.items():
+            self.sketches[name].merge(sketch)
+        return self
+
+    @property
+    def count(self):
+        return max(s.count for s in self.sketches.values())
+
+    def reference(self, low=1.0, high=99.0, previous=None):
+        """feature_reference.json content: min/max at the given percentiles, observed extremes alongside.
+
+        A feature with no finite values keeps its entry from `previous` (the
+        reference being replaced); without one, ValueError is raised rather
+        than returning a reference that normalize() can't use.
+        """
+        ref = {}
+        for name, sketch in self.sketches.items():
+            if sketch.count == 0:
+                if name not in (previous or {}):
+                    raise ValueError(f"no values extracted for {name} and no previous reference to keep")
+                ref[name] = previous[name]
+                continue
+            ref[name] = {
+                "min": sketch.quantile(low / 100),
+                "max": sketch.quantile(high / 100),
+                "observed_min": sketch.min,
+                "observed_max": sketch.max,
+                "percentiles": [low, high],
+                "count": sketch.count,
+            }
+        return ref
+
+    def to_dict(self):
+        return {name: sketch.to_dict() for name, sketch in self.sketches.items()}
+
+    @classmethod
+    def from_dict(cls, d):
+        summary = cls()
+        summary.sketches.update({name: QuantileSketch.from_dict(s) for name, s in d.items()})
+        return summary
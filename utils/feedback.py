@@ -0,0 +1,139 @@
+import csv
+import io
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+FEEDBACK_DB = os.environ.get("EMOTION_FEEDBACK_DB", "feedback.db")
+LEGACY_CSV = Path("responses.csv")
+CSV_COLUMNS = ["Song", "AI", "User", "Name", "Result", "Date"]
+EXPORT_BATCH = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    id INTEGER PRIMARY KEY,
+    song TEXT NOT NULL,
+    ai TEXT NOT NULL,
+    user_label TEXT NOT NULL,
+    name TEXT NOT NULL,
+    result TEXT NOT NULL,
+    date TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_song ON responses(song);
+CREATE INDEX IF NOT EXISTS responses_ai ON responses(ai);
+CREATE INDEX IF NOT EXISTS responses_user_label ON responses(user_label);
+CREATE INDEX IF NOT EXISTS responses_name ON responses(name);
+
+-- Per-AI-class agreement, kept current by triggers so reads never scan responses
+CREATE TABLE IF NOT EXISTS agreement (
+    ai TEXT PRIMARY KEY,
+    total INTEGER NOT NULL DEFAULT 0,
+    matched INTEGER NOT NULL DEFAULT 0
+);
+CREATE TRIGGER IF NOT EXISTS agreement_insert AFTER INSERT ON responses BEGIN
+    INSERT INTO agreement (ai, total, matched) VALUES (NEW.ai, 1, NEW.ai = NEW.user_label)
+    ON CONFLICT(ai) DO UPDATE SET total = total + 1, matched = matched + (NEW.ai = NEW.user_label);
+END;
+CREATE TRIGGER IF NOT EXISTS agreement_delete AFTER DELETE ON responses BEGIN
+    UPDATE agreement SET total = total - 1, matched = matched - (OLD.ai = OLD.user_label) WHERE ai = OLD.ai;
+END;
+"""
+
+class FeedbackStore:
+    """Song feedback in SQLite (WAL), safe for concurrent sessions and processes.
+
+    Each thread gets its own connection; writers are serialised by SQLite and
+    readers never block them. A responses.csv left by older versions is
+    imported once into an empty store and renamed to responses.csv.imported.
+    """
+
+    def __init__(self, path=FEEDBACK_DB):
+        self.path = str(path)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+        self._import_legacy_csv()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _import_legacy_csv(self):
+        if not LEGACY_CSV.exists():
+            return
+        conn = self._conn()
+        with conn:
+            # Write lock first, so two processes starting together import the file once
+            conn.execute("BEGIN IMMEDIATE")
+            if self.count() or not LEGACY_CSV.exists():
+                return
+            with open(LEGACY_CSV, newline="", encoding="utf-8") as f:
+                rows = [(r["Song"], r["AI"], r["User"], r["Name"], r["Result"], r["Date"]) for r in csv.DictReader(f)]
+            conn.executemany("INSERT INTO responses (song, ai, user_label, name, result, date) VALUES (?, ?, ?, ?, ?, ?)", rows)
+            os.replace(LEGACY_CSV, LEGACY_CSV.with_name(LEGACY_CSV.name + ".imported"))
+
+    def add(self, song, ai, user_label, name, date=None):
+        result = "Matched" if ai == user_label else "Not Matched"
+        with self._conn() as conn:
+            conn.execute("INSERT INTO responses (song, ai, user_label, name, result, date) VALUES (?, ?, ?, ?, ?, ?)",
+                         (song, ai, user_label, name, result, date or time.strftime("%Y-%m-%d %H:%M")))
+        return result
+
+    def count(self):
+        return self._conn().execute("SELECT COALESCE(SUM(total), 0) FROM agreement").fetchone()[0]
+
+    def agreement(self):
+        """{ai_label: {"total", "matched", "rate"}} from the trigger-maintained aggregate table."""
+        rows = self._conn().execute("SELECT ai, total, matched FROM agreement WHERE total > 0 ORDER BY ai")
+        return {ai: {"total": total, "matched": matched, "rate": matched / total} for ai, total, matched in rows}
+
+    def iter_csv(self, batch=EXPORT_BATCH):
+        """The responses as CSV text in the old responses.csv layout, EXPORT_BATCH rows per chunk."""
+        buf = io.StringIO()
+        writer = csv.writer(buf, lineterminator="\n")
+        writer.writerow(CSV_COLUMNS)
+        cursor = self._conn().execute("SELECT song, ai, user_label, name, result, date FROM responses ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(batch)
+            writer.writerows(rows)
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+            if not rows:
+                break
+
+    def export_csv(self):
+        """The CSV export spooled chunk by chunk to an anonymous temp file, rewound.
+
+        For st.download_button: pass the bound method so it only runs when
+        clicked. The table is never held as one string here; the unbuffered
+        (raw) file is what Streamlit accepts as a file object.
+        """
+        f = tempfile.TemporaryFile(buffering=0)
+        for chunk in self.iter_csv():
+            f.write(chunk.encode("utf-8"))
+        f.seek(0)
+        return f
+
+    def clear(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM responses")
+            conn.execute("DELETE FROM agreement")
+
+_default_store = None
+_store_lock = threading.Lock()
+
+def get_feedback_store():
+    global _default_store
+    with _store_lock:
+        if _default_store is None:
+            _default_store = FeedbackStore()
+        return _default_store
@@ -0,0 +1,214 @@
+from collections import deque
+
+import numpy as np
+
+from utils.audio_utils import SR, N_MELS, HOP_LENGTH, TARGET_FRAMES, extract_logmel, get_front_end
+from utils.batching import MICROBATCH, predict as batched_predict
+from utils.timing import timed
+
+EMOTION_CLASSES = ["Calm", "Energetic", "Happy", "Romantic", "Sad"]
+NUM_CHUNKS = 10
+BATCH_SIZE = 32
+HOP_SECONDS = 1.0
+EARLY_EXIT_MARGIN = 0.3
+EARLY_EXIT_MIN_CHUNKS = 3
+EARLY_EXIT_STEP = 2
+
+def build_batch(mels):
+    # Same pad/trim + per-chunk z-score as prepare_input, written into one (N, 128, 431, 3) tensor
+    return get_front_end().batch(mels)
+
+@timed("inference")
+def predict_batch(model, batch):
+    if len(batch) == 0:
+        return np.empty((0, len(EMOTION_CLASSES)), dtype=np.float32)
+    if MICROBATCH:
+        # Merged with concurrent calls from other sessions into one forward pass
+        return batched_predict(model, batch)
+    return np.asarray(model.predict(batch, batch_size=BATCH_SIZE, verbose=0))
+
+def summarize(preds, bounds):
+    avg_pred = np.mean(preds, axis=0)
+    timeline = [(start, end, EMOTION_CLASSES[int(np.argmax(p))]) for (start, end), p in zip(bounds, preds)]
+    return avg_pred, timeline
+
+def chunk_bounds(n_samples, num_chunks=NUM_CHUNKS):
+    chunk_len = n_samples // num_chunks
+    return [(i * chunk_len, (i + 1) * chunk_len) for i in range(num_chunks)]
+
+def analyze_chunks(model, y, num_chunks=NUM_CHUNKS, mels=None):
+    """Split y into num_chunks equal slices and classify them in one forward pass.
+
+    mels may carry precomputed chunk log-mels (see extract_logmel_chunks).
+    Returns (per-chunk probabilities, averaged probabilities, timeline) where the
+    timeline holds (start_s, end_s, emotion) per chunk.
+    """
+    bounds = chunk_bounds(len(y), num_chunks)
+    if mels is None:
+        mels = [extract_logmel(y[start:end]) for start, end in bounds]
+    preds = predict_batch(model, build_batch(mels))
+    avg_pred, timeline = summarize(preds, [(start / SR, end / SR) for start, end in bounds])
+    return preds, avg_pred, timeline
+
+def window_mels(mel, hop=TARGET_FRAMES):
+    return [mel[:, start:start + TARGET_FRAMES] for start in range(0, mel.shape[1], hop)]
+
+def window_batch(y):
+    """Model batch of consecutive TARGET_FRAMES windows of the full-track mel, with their (start_s, end_s) bounds."""
+    if len(y) < TARGET_FRAMES:
+        y = np.pad(y, (0, TARGET_FRAMES - len(y)))
+    mel = extract_logmel(y)
+    mels = window_mels(mel)
+    bounds = [(i * TARGET_FRAMES * HOP_LENGTH / SR, min((i + 1) * TARGET_FRAMES, mel.shape[1]) * HOP_LENGTH / SR)
+              for i in range(len(mels))]
+    return build_batch(mels), bounds
+
+def analyze_windows(model, y, early_exit=None):
+    """Classify consecutive TARGET_FRAMES windows of the full-track mel in one forward pass.
+
+    With early_exit (a top-2 margin), windows are predicted a few at a time
+    and only until the running mean is that decisive; see early_exit_predict.
+    """
+    batch, bounds = window_batch(y)
+    if early_exit is None:
+        preds = predict_batch(model, batch)
+    else:
+        [(preds, used)] = early_exit_predict(model, [batch], early_exit)
+        bounds = [bounds[i] for i in used]
+    avg_pred, timeline = summarize(preds, bounds)
+    return preds, avg_pred, timeline
+
+def spread_order(n):
+    """Chunk indices middle first, then the midpoints of the remaining halves, so early chunks span the song."""
+    order, spans = [], deque([(0, n)])
+    while spans:
+        lo, hi = spans.popleft()
+        if lo < hi:
+            mid = (lo + hi) // 2
+            order.append(mid)
+            spans.extend([(lo, mid), (mid + 1, hi)])
+    return order
+
+def top2_margin(p):
+    second, first = np.sort(p)[-2:]
+    return float(first - second)
+
+def early_exit_predict(model, batches, margin=EARLY_EXIT_MARGIN, min_chunks=EARLY_EXIT_MIN_CHUNKS,
+                       step=EARLY_EXIT_STEP, order=spread_order):
+    """Per song, predict chunks in `order` until the running mean's top-2 margin reaches `margin`.
+
+    batches holds one (n, 128, 431, 3) batch per song. Songs advance in
+    rounds (min_chunks first, then `step` more) and each round is a single
+    predict over every song still undecided, so several songs keep sharing
+    a forward pass. Returns [(preds, used)] per song: the probabilities of
+    the chunks that were run, in chunk order, and their indices.
+    """
+    orders = [list(order(len(b))) for b in batches]
+    preds = [dict() for _ in batches]
+    sums = [np.zeros(len(EMOTION_CLASSES)) for _ in batches]
+    active = [i for i, b in enumerate(batches) if len(b)]
+    take = min_chunks
+    while active:
+        picks = [(i, orders[i][len(preds[i]):len(preds[i]) + take]) for i in active]
+        out = predict_batch(model, np.concatenate([batches[i][idx] for i, idx in picks]))
+        offset, still = 0, []
+        for i, idx in picks:
+            for j, p in zip(idx, out[offset:offset + len(idx)]):
+                preds[i][j] = p
+                sums[i] += p
+            offset += len(idx)
+            if len(preds[i]) < len(batches[i]) and top2_margin(sums[i] / len(preds[i])) < margin:
+                still.append(i)
+        active, take = still, step
+    results = []
+    for song in preds:
+        used = sorted(song)
+        results.append((np.array([song[j] for j in used]).reshape(len(used), len(EMOTION_CLASSES)), used))
+    return results
+
+def seconds_to_frames(seconds):
+    return max(1, int(round(seconds * SR / HOP_LENGTH)))
+
+def sliding_starts(n_frames, window, hop):
+    """Window start frames every `hop` frames, plus one window ending at the last frame if the hops miss it."""
+    starts = np.arange(0, n_frames - window + 1, hop)
+    if starts[-1] != n_frames - window:
+        starts = np.append(starts, n_frames - window)
+    return starts
+
+def window_stats(mel, starts, window):
+    """Per-window mean and std of the window zero-padded to TARGET_FRAMES, as build_batch computes them.
+
+    Uses running column sums, so every window costs O(1) and nothing is copied.
+    """
+    n = N_MELS * TARGET_FRAMES
+    c1 = np.concatenate([[0.0], np.cumsum(mel.sum(axis=0, dtype=np.float64))])
+    c2 = np.concatenate([[0.0], np.cumsum(np.square(mel, dtype=np.float64).sum(axis=0))])
+    s1 = c1[starts + window] - c1[starts]
+    s2 = c2[starts + window] - c2[starts]
+    mean = s1 / n
+    std = np.sqrt(np.maximum(s2 / n - mean ** 2, 0.0))
+    return mean.astype(np.float32), std.astype(np.float32)
+
+def sliding_batches(mel, window=TARGET_FRAMES, hop=TARGET_FRAMES, batch_size=BATCH_SIZE):
+    """Yield (batch, starts) of z-scored model inputs for windows of `window` frames every `hop` frames.
+
+    Windows are strided views of mel (sliding_window_view), normalised
+    straight into one reused (batch_size, 128, 431, 3) buffer, so memory is
+    one batch however small the hop. Windows shorter than TARGET_FRAMES are
+    zero-padded before normalising, like build_batch does. The buffer is
+    overwritten by the next batch; predict before advancing.
+    """
+    if not 0 < window <= TARGET_FRAMES:
+        raise ValueError(f"window must be 1..{TARGET_FRAMES} frames, got {window}")
+    if mel.shape[1] < window:
+        yield build_batch([mel]), np.zeros(1, dtype=int)
+        return
+    starts = sliding_starts(mel.shape[1], window, hop)
+    mean, std = window_stats(mel, starts, window)
+    scale = 1 / (std + 1e-6)
+    views = np.lib.stride_tricks.sliding_window_view(mel, window, axis=1).transpose(1, 0, 2)  # (T-w+1, 128, w), no copy
+    buf = np.empty((min(batch_size, len(starts)), N_MELS, TARGET_FRAMES, 3), dtype=np.float32)
+    for i in range(0, len(starts), batch_size):
+        idx = starts[i:i + batch_size]
+        m, k = mean[i:i + batch_size, None, None], scale[i:i + batch_size, None, None]
+        out = buf[:len(idx), ..., 0]
+        # Starts are on the hop grid except possibly the final tail window: a strided view over the
+        # window views covers the regular ones, the tail is a view of its own
+        regular = len(idx) if len(idx) == 1 or idx[-1] - idx[-2] == hop else len(idx) - 1
+        np.subtract(views[idx[0]:idx[regular - 1] + 1:hop], m[:regular], out=out[:regular, :, :window])
+        if regular < len(idx):
+            np.subtract(views[idx[-1]], m[-1], out=out[-1, :, :window])
+        out[:, :, :window] *= k
+        out[:, :, window:] = -m * k
+        buf[:len(idx), ..., 1] = out
+        buf[:len(idx), ..., 2] = out
+        yield buf[:len(idx)], idx
+
+def sliding_bounds(starts, window, n_frames):
+    """Contiguous (start_s, end_s) bins, one per window, split halfway between neighbouring window centres."""
+    centers = (starts + window / 2) * HOP_LENGTH / SR
+    edges = np.concatenate([[0.0], (centers[:-1] + centers[1:]) / 2, [n_frames * HOP_LENGTH / SR]])
+    return list(zip(edges[:-1].tolist(), edges[1:].tolist()))
+
+def analyze_sliding(model, y=None, window_seconds=None, hop_seconds=HOP_SECONDS, mel=None):
+    """Classify overlapping windows of the full-track mel (window/hop in seconds).
+
+    Returns (per-window probabilities, averaged probabilities, timeline) like
+    analyze_chunks; the timeline has one entry per hop, centred on its window.
+    """
+    if mel is None:
+        mel = extract_logmel(y)
+    window = min(seconds_to_frames(window_seconds), TARGET_FRAMES) if window_seconds else TARGET_FRAMES
+    hop = seconds_to_frames(hop_seconds)
+    preds, starts = [], []
+    for batch, idx in sliding_batches(mel, window, hop):
+        preds.append(predict_batch(model, batch))
+        starts.append(idx)
+    preds = np.concatenate(preds)
+    avg_pred, timeline = summarize(preds, sliding_bounds(np.concatenate(starts), min(window, mel.shape[1]), mel.shape[1]))
+    return preds, avg_pred, timeline
+
+def top_emotion(avg_pred):
+    final_idx = int(np.argmax(avg_pred))
+    return EMOTION_CLASSES[final_idx], float(avg_pred[final_idx])
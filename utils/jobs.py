@@ -0,0 +1,230 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from utils.spool import session_owner
+
+JOB_WORKERS = int(os.environ.get("EMOTION_JOB_WORKERS", 2))
+RETENTION = 3600  # seconds a finished job's result stays available
+MAX_RETAINED = 256
+POLL_SECONDS = 0.5
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+class JobCancelled(Exception):
+    pass
+
+class Job:
+    """One unit of background work. fn(job) runs on a worker and may call
+    job.report(...) for progress and job.check_cancelled() between steps."""
+
+    def __init__(self, key, fn, owner, label=""):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.fn = fn
+        self.label = label
+        self.owners = {owner}
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = ""
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+
+    def report(self, progress, message=""):
+        self.progress = min(max(float(progress), 0.0), 1.0)
+        if message:
+            self.message = message
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def _finish(self, status, result=None, error=None):
+        self.status, self.result, self.error = status, result, error
+        if status == DONE:
+            self.progress = 1.0
+        self.finished = time.time()
+        self.fn = None  # drop the closure (audio bytes, models) once it has run
+        self._done.set()
+
+class JobManager:
+    """Bounded pool of worker threads shared by every session in the process.
+
+    Jobs with the same key that are queued, running or finished within
+    RETENTION are shared: a second tab analysing the same song gets the same
+    job. Queued jobs are taken round-robin across owners, so one user's
+    library scan cannot starve another user's single song. A job is only
+    cancelled once every session waiting on it has cancelled.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, retention=RETENTION, max_retained=MAX_RETAINED):
+        self.retention = retention
+        self.max_retained = max_retained
+        self._lock = threading.Condition()
+        self._jobs = OrderedDict()  # id -> Job, oldest first
+        self._by_key = {}
+        self._queues = OrderedDict()  # owner -> deque of queued jobs, in round-robin order
+        self._running = 0
+        self._threads = [threading.Thread(target=self._work, name=f"emotion-job-{i}", daemon=True)
+                         for i in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, key, fn, owner=None, label="", retry=False):
+        """The job for key, creating and queueing it unless an identical one can be shared.
+
+        A failed job keeps being returned (so every waiter sees its error)
+        until it expires or retry=True replaces it.
+        """
+        owner = owner or session_owner()
+        with self._lock:
+            self._reap()
+            job = self._by_key.get(key)
+            if job is not None and job.status != CANCELLED and not (retry and job.status == FAILED):
+                job.owners.add(owner)
+                return job
+            job = Job(key, fn, owner, label)
+            self._jobs[job.id] = job
+            self._by_key[key] = job
+            self._queues.setdefault(owner, deque()).append(job)
+            self._lock.notify()
+            return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id, owner=None):
+        owner = owner or session_owner()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return
+            job.owners.discard(owner)
+            if job.owners:
+                return
+            job._cancel.set()
+            if job.status == QUEUED:
+                for queue in self._queues.values():
+                    if job in queue:
+                        queue.remove(job)
+                job._finish(CANCELLED)
+
+    def _next(self):
+        # Round-robin: take from the first owner with work, then move that owner to the back
+        for owner in list(self._queues):
+            queue = self._queues.pop(owner)
+            if queue:
+                job = queue.popleft()
+                if queue:
+                    self._queues[owner] = queue
+                return job
+        return None
+
+    def _work(self):
+        while True:
+            with self._lock:
+                job = self._next()
+                while job is None:
+                    self._lock.wait()
+                    job = self._next()
+                job.status = RUNNING
+                self._running += 1
+            try:
+                job.check_cancelled()
+                result = job.fn(job)
+                job._finish(DONE, result)
+            except JobCancelled:
+                job._finish(CANCELLED)
+            except Exception as e:
+                job._finish(FAILED, error=f"{type(e).__name__}: {e}")
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+    def _reap(self):
+        cutoff = time.time() - self.retention
+        finished = [j for j in self._jobs.values() if j.status in FINISHED]
+        excess = len(self._jobs) - self.max_retained
+        for job in finished:
+            if job.finished < cutoff or excess > 0:
+                del self._jobs[job.id]
+                if self._by_key.get(job.key) is job:
+                    del self._by_key[job.key]
+                excess -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": len(self._threads),
+                "running": self._running,
+                "queued": sum(len(q) for q in self._queues.values()),
+                "retained": len(self._jobs),
+            }
+
+_default_manager = None
+_manager_lock = threading.Lock()
+
+def get_job_manager():
+    global _default_manager
+    with _manager_lock:
+        if _default_manager is None:
+            _default_manager = JobManager()
+        return _default_manager
+
+def run_job(key, fn, text="Working...", widget_key="job", label=""):
+    """Streamlit helper: submit fn as a job (or join the identical one) and return its result once done.
+
+    Until then it shows progress with a cancel button and reruns the page,
+    so other widgets stay usable and reruns never restart the work. Returns
+    None if the job failed or this session cancelled it, after showing why
+    and a button to run it again.
+    """
+    import streamlit as st
+    cancelled_flag = f"job_cancelled_{widget_key}"
+    if st.session_state.get(cancelled_flag) == key:
+        st.info("Analysis cancelled.")
+        if st.button("↻ Restart analysis", key=f"restart_{widget_key}"):
+            del st.session_state[cancelled_flag]
+            st.rerun()
+        return None
+
+    retry_flag = f"job_retry_{widget_key}"
+    job = get_job_manager().submit(key, fn, label=label, retry=st.session_state.pop(retry_flag, False))
+    if job.status == DONE:
+        return job.result
+    if job.status == FAILED:
+        st.error(f"Analysis failed: {job.error}")
+        if st.button("↻ Retry", key=f"retry_{widget_key}"):
+            st.session_state[retry_flag] = True
+            st.rerun()
+        return None
+    if job.status == CANCELLED:
+        # Cancelled by its other owners between submit and now; the next rerun starts a fresh job
+        st.rerun()
+
+    col_bar, col_cancel = st.columns([0.85, 0.15])
+    with col_bar:
+        message = job.message or text
+        st.progress(job.progress, text=f"{message} (queued)" if job.status == QUEUED else message)
+    with col_cancel:
+        if st.button("✖ Cancel", key=f"cancel_{widget_key}", use_container_width=True):
+            get_job_manager().cancel(job.id)
+            st.session_state[cancelled_flag] = key
+            st.rerun()
+    job.wait(POLL_SECONDS)
+    st.rerun()
@@ -0,0 +1,12 @@
+import os
+from pathlib import Path
+
+AUDIO_EXTENSIONS = {".mp3", ".wav"}
+FFMPEG = "ffmpeg"  # decodes YouTube streams and containers libsndfile can't read
+
+def find_audio_files(root):
+    """Resolved paths of the mp3/wav files under root, walked in a stable order."""
+    for dirpath, _, filenames in os.walk(root):
+        for name in sorted(filenames):
+            if Path(name).suffix.lower() in AUDIO_EXTENSIONS:
+                yield str(Path(dirpath, name).resolve())
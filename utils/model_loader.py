@@ -1,6 +1,140 @@
-import tensorflow as tf
-import streamlit as st
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
 
-@st.cache_resource
-def load_emotion_model(path="mobileNetV2.keras"):
-    return tf.keras.models.load_model(path)
+import numpy as np
+
+from utils.backends import DEFAULT_BACKEND, load_backend
+
+MODEL_BUDGET_BYTES = int(float(os.environ.get("EMOTION_MODEL_BUDGET_MB", 512)) * 1024 * 1024)
+
+def model_bytes(model):
+    """Approximate resident size of a loaded backend: its weights, or the .tflite file."""
+    keras_model = getattr(model, "model", None)
+    if keras_model is not None and hasattr(keras_model, "weights"):
+        return sum(np.asarray(w).nbytes for w in keras_model.weights)
+    try:
+        return Path(model.path).stat().st_size
+    except (AttributeError, OSError):
+        return 0
+
+class ModelRegistry:
+    """Loaded models shared by every page and session of the process.
+
+    Entries are keyed by (resolved path, mtime, size, backend), so
+    "mobileNetV2.keras" and "./mobileNetV2.keras" share one copy, and
+    replacing the file on disk loads the new weights on the next get() and
+    drops the old entry. Least recently used entries are evicted once the
+    total exceeds max_bytes; the entry being returned is never evicted, so
+    one model larger than the budget still loads. Each key is loaded at most
+    once even when several sessions ask for it at the same time.
+    """
+
+    def __init__(self, max_bytes=MODEL_BUDGET_BYTES, loader=load_backend):
+        self.max_bytes = max_bytes
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> {"model", "bytes", "loaded", "used"}
+        self._loading = {}  # key -> Lock held while that key loads
+        self.loads = 0
+        self.reloads = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(path, backend=DEFAULT_BACKEND):
+        p = Path(path).resolve()
+        st = p.stat()  # FileNotFoundError for a bad path: nothing is cached for it
+        return (str(p), st.st_mtime_ns, st.st_size, backend)
+
+    def get(self, path, backend=DEFAULT_BACKEND):
+        key = self.key(path, backend)
+        with self._lock:
+            entry = self._touch(key)
+            if entry is not None:
+                return entry["model"]
+            load_lock = self._loading.setdefault(key, threading.Lock())
+        with load_lock:
+            with self._lock:
+                entry = self._touch(key)
+            if entry is None:
+                try:
+                    model = self.loader(key[0], backend)
+                except BaseException:
+                    with self._lock:
+                        self._loading.pop(key, None)
+                    raise
+                entry = {"model": model, "bytes": model_bytes(model), "loaded": time.time(), "used": time.time()}
+                with self._lock:
+                    self._entries[key] = entry
+                    self._loading.pop(key, None)
+                    self.loads += 1
+                    stale = [k for k in self._entries if k[0] == key[0] and k[3] == backend and k != key]
+                    self.reloads += bool(stale)
+                    dropped = [self._entries.pop(k)["model"] for k in stale] + self._over_budget(keep=key)
+                _release(dropped)
+        return entry["model"]
+
+    def _touch(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry["used"] = time.time()
+            self._entries.move_to_end(key)
+        return entry
+
+    def _over_budget(self, keep):
+        dropped = []
+        total = sum(e["bytes"] for e in self._entries.values())
+        for k in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if k == keep:
+                continue
+            entry = self._entries.pop(k)
+            total -= entry["bytes"]
+            self.evictions += 1
+            dropped.append(entry["model"])
+        return dropped
+
+    def evict(self, path=None, backend=None):
+        """Unload matching entries (all of them by default); returns how many were dropped."""
+        resolved = str(Path(path).resolve()) if path is not None else None
+        with self._lock:
+            keys = [k for k in self._entries
+                    if (resolved is None or k[0] == resolved) and (backend is None or k[3] == backend)]
+            dropped = [self._entries.pop(k)["model"] for k in keys]
+            self.evictions += len(keys)
+        _release(dropped)
+        return len(dropped)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "models": [{"path": k[0], "backend": k[3], "mb": round(e["bytes"] / 1e6, 1),
+                            "idle_s": round(time.time() - e["used"], 1)} for k, e in self._entries.items()],
+                "bytes": sum(e["bytes"] for e in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "loads": self.loads,
+                "reloads": self.reloads,
+                "evictions": self.evictions,
+            }
+
+def _release(models):
+    # Stop their micro-batchers; sessions still holding a model keep it alive until their next rerun
+    from utils.batching import release_batcher
+    for model in models:
+        release_batcher(model)
+
+_default_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry():
+    global _default_registry
+    with _registry_lock:
+        if _default_registry is None:
+            _default_registry = ModelRegistry()
+        return _default_registry
+
+def load_emotion_model(path="mobileNetV2.keras", backend=DEFAULT_BACKEND):
+    return get_registry().get(path, backend)
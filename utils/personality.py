@@ -0,0 +1,180 @@
+import json
+
+import numpy as np
+import librosa
+
+from utils.timing import span, timed
+
+SR = 22050
+REFERENCE_PATH = "feature_reference.json"
+MAX_AUDIO_DURATION = 90
+
+# ==============================
+# REFERENCE DATA 
+# ==============================
+try:
+    with open(REFERENCE_PATH, "r") as f:
+        FEATURE_REF = json.load(f)
+except FileNotFoundError:
+    FEATURE_REF = {
+        "tempo_bpm": {"min": 51.6796875, "max": 215.33203125},
+        "loudness_db": {"min": -21.87506, "max": -3.8104322},
+        "timbre_spectral_centroid": {"min": 820.41504892454, "max": 4050.5376104961033}
+    }
+
+# ==============================
+# LOGIC FUNCTIONS
+# ==============================
+def extract_features(audio_file):
+    # ===============================
+    # 1. Load Audio
+    # ===============================
+    with span("decode"):
+        y, sr = librosa.load(audio_file, sr=SR, duration=MAX_AUDIO_DURATION)
+    return extract_features_from_signal(y, sr)
+
+# Precomputed rotations: row i scores the key i semitones up, i.e. np.dot(np.roll(chroma, -i), template)
+MAJOR_TEMPLATE = np.array([1, 0, 1, 0, 1, 1, 0, 1, 0, 1, 0, 1])
+MINOR_TEMPLATE = np.array([1, 0, 1, 1, 0, 1, 0, 1, 1, 0, 1, 0])
+MODE_TEMPLATES = np.stack([np.roll(t, i) for t in (MAJOR_TEMPLATE, MINOR_TEMPLATE) for i in range(12)])
+
+def fold_tempos(tempos, low=60, high=180):
+    # Same as doubling while < low, then halving while > high; powers of two keep it exact
+    tempos = np.asarray(tempos, dtype=float)
+    up = np.maximum(np.ceil(np.log2(low / tempos)), 0)
+    tempos = tempos * 2 ** up
+    down = np.maximum(np.ceil(np.log2(tempos / high)), 0)
+    return tempos / 2 ** down
+
+@timed("personality_features")
+def extract_features_from_signal(y, sr=SR):
+    if len(y) == 0:
+        raise ValueError("Audio file is empty or too short.")
+
+    # ===============================
+    # 1. One magnitude STFT feeds onset, centroid and chroma
+    # ===============================
+    S = np.abs(librosa.stft(y))
+    power = S ** 2
+
+    # ===============================
+    # 2. Robust Multi-Tempo Detection
+    # ===============================
+    mel_db = librosa.power_to_db(librosa.feature.melspectrogram(S=power, sr=sr))
+    onset_env = librosa.onset.onset_strength(S=mel_db, sr=sr)
+
+    # Get multiple tempo candidates
+    tempo_candidates = librosa.beat.tempo(
+        onset_envelope=onset_env,
+        sr=sr,
+        aggregate=None
+    )
+
+    tempo_candidates = np.array(tempo_candidates)
+
+    # Remove unrealistic extremes
+    tempo_candidates = tempo_candidates[
+        (tempo_candidates > 40) & (tempo_candidates < 200)
+    ]
+
+    # Normalize into 60–180 BPM range, final tempo = median of normalized candidates
+    normalized_tempos = fold_tempos(tempo_candidates)
+    tempo = float(np.median(normalized_tempos)) if len(normalized_tempos) > 0 else float(np.mean(tempo_candidates))
+
+    # ===============================
+    # 3. Loudness (RMS → dB)
+    # ===============================
+    # Time-domain frames (no FFT involved); the STFT-based estimate is windowed and reads ~1 dB off
+    rms = librosa.feature.rms(y=y)[0]
+    loudness_db = float(np.mean(librosa.amplitude_to_db(rms, ref=np.max)))
+
+    # ===============================
+    # 4. Timbre (Spectral Centroid)
+    # ===============================
+    timbre = float(np.mean(librosa.feature.spectral_centroid(S=S, sr=sr)))
+
+    # ===============================
+    # 5. Musical Mode (12-Key Tracking)
+    # ===============================
+    chroma_mean = np.mean(librosa.feature.chroma_stft(S=power, sr=sr), axis=1)
+    scores = MODE_TEMPLATES @ chroma_mean
+    major_best, minor_best = scores[:12].max(), scores[12:].max()
+
+    # Slight bias toward minor (good for Sinhala emotional songs)
+    mode = "Minor" if minor_best * 1.05 > major_best else "Major"
+
+    return tempo, loudness_db, timbre, mode
+
+def normalize(value, feature):
+    min_v, max_v = FEATURE_REF[feature]["min"], FEATURE_REF[feature]["max"]
+    return (np.clip(value, min_v, max_v) - min_v) / (max_v - min_v)
+
+def level(norm):
+    return "Low" if norm < 0.5 else "High"
+
+# ==============================
+# BIG FIVE RULES
+# ==============================
+TRAITS = ["Extraversion","Agreeableness","Neuroticism","Conscientiousness","Openness"]
+FEATURE_LEVELS = {
+    "tempo": ["High", "Low"],
+    "energy": ["High", "Low"],
+    "mode": ["Major", "Minor"],
+    "timbre": ["High", "Low"],
+}
+RULES = {
+    ("tempo", "High"): {"Extraversion":2,"Agreeableness":1,"Neuroticism":0,"Conscientiousness":1,"Openness":1},
+    ("tempo", "Low"):  {"Extraversion":0,"Agreeableness":1,"Neuroticism":2,"Conscientiousness":1,"Openness":2},
+    ("energy", "High"): {"Extraversion":2,"Agreeableness":0,"Neuroticism":1,"Conscientiousness":1,"Openness":1},
+    ("energy", "Low"):  {"Extraversion":0,"Agreeableness":2,"Neuroticism":2,"Conscientiousness":2,"Openness":2},
+    ("mode", "Major"): {"Extraversion":2,"Agreeableness":2,"Neuroticism":0,"Conscientiousness":1,"Openness":1},
+    ("mode", "Minor"): {"Extraversion":0,"Agreeableness":1,"Neuroticism":2,"Conscientiousness":1,"Openness":2},
+    ("timbre", "High"): {"Extraversion":1,"Agreeableness":0,"Neuroticism":1,"Conscientiousness":0,"Openness":2},
+    ("timbre", "Low"):  {"Extraversion":1,"Agreeableness":2,"Neuroticism":0,"Conscientiousness":2,"Openness":1}
+}
+FEATURES = list(FEATURE_LEVELS)
+# RULE_WEIGHTS[f, l, t]: votes for trait t when feature f is at its l-th level
+RULE_WEIGHTS = np.array([[[RULES[(feat, lvl)][t] for t in TRAITS] for lvl in FEATURE_LEVELS[feat]]
+                         for feat in FEATURES], dtype=float)
+
+def level_codes(tempo, energy, timbre, mode):
+    """(N, len(FEATURES)) level indices for arrays of raw features; same thresholds as level(normalize(...))."""
+    low = lambda value, feature: np.where(normalize(np.asarray(value, dtype=float), feature) < 0.5, 1, 0)
+    codes = {
+        "tempo": low(tempo, "tempo_bpm"),
+        "energy": low(energy, "loudness_db"),
+        "timbre": low(timbre, "timbre_spectral_centroid"),
+        "mode": np.where(np.asarray(mode) == "Major", 0, 1),
+    }
+    return np.stack([codes[feat] for feat in FEATURES], axis=-1)
+
+def score_big_five(codes):
+    """Average trait votes (N, len(TRAITS)) for level codes (N, len(FEATURES)); -1 marks a missing feature."""
+    codes = np.atleast_2d(codes)
+    present = codes >= 0
+    votes = RULE_WEIGHTS[np.arange(len(FEATURES)), np.where(present, codes, 0)]
+    total = (votes * present[..., None]).sum(axis=1)
+    count = present.sum(axis=1, keepdims=True)
+    return np.divide(total, count, out=np.zeros_like(total), where=count > 0)
+
+def trait_levels(avg):
+    return np.select([avg <= 0.67, avg <= 1.33], ["Low", "Moderate"], "High")
+
+def big_five_results(avg):
+    return {t: {"level": str(lbl), "confidence": float(a) / 2} for t, a, lbl in zip(TRAITS, avg, trait_levels(avg))}
+
+def compute_big_five(feature_levels):
+    codes = [FEATURE_LEVELS[f].index(feature_levels[f]) if feature_levels.get(f) in FEATURE_LEVELS[f] else -1
+             for f in FEATURES]
+    return big_five_results(score_big_five(codes)[0])
+
+def playlist_profile(features):
+    """Aggregate listener profile for many songs' (tempo, loudness_db, timbre, mode) tuples.
+
+    Returns (profile, scores): profile is in compute_big_five's format and
+    averages every song's trait votes; scores[i] holds song i's average votes,
+    so scores[i] / len(scores) is its contribution to the profile.
+    """
+    tempo, energy, timbre, mode = zip(*features)
+    scores = score_big_five(level_codes(tempo, energy, timbre, mode))
+    return big_five_results(scores.mean(axis=0)), scores
@@ -0,0 +1,101 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import librosa
+
+from utils.audio_utils import SR
+from utils.inference import window_batch, predict_batch, summarize, early_exit_predict
+from utils.streaming import analyze_stream
+from utils.timing import span
+
+DECODE_WORKERS = 4
+PREFETCH = 8
+MAX_BATCH_CHUNKS = 64
+
+def prepare_song(path, duration):
+    with span("decode"):
+        y, _ = librosa.load(path, sr=SR, mono=True, duration=duration)
+    return window_batch(y)
+
+def pipelined_scan(model, paths, duration, workers=DECODE_WORKERS, prefetch=PREFETCH, max_batch=MAX_BATCH_CHUNKS,
+                   early_exit=None, counts=None):
+    """Classify many files, overlapping decode/mel with inference.
+
+    A thread pool decodes and builds window batches for up to `prefetch` files
+    ahead while the calling thread predicts. Songs whose features are already
+    ready are merged into one predict call of up to `max_batch` chunks. Yields
+    (preds, avg_pred, timeline) per file, in input order, as soon as each is done,
+    so the caller can drive a progress bar from its own thread.
+
+    early_exit (a top-2 margin) stops each song once its running mean is that
+    decisive (inference.early_exit_predict); preds and timeline then cover the
+    windows that were run. `counts`, if given, accumulates "windows" and
+    "evaluated" so the caller can report how many were skipped.
+
+    duration=None analyses whole tracks: each worker streams its file through
+    streaming.analyze_stream (predictions still merge across workers in the
+    micro-batcher), so memory per file stays constant however long it is.
+    """
+    paths = list(paths)
+    if duration is None:
+        yield from _streamed_scan(model, paths, workers, prefetch, early_exit, counts)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        next_idx = 0
+
+        def refill():
+            nonlocal next_idx
+            while next_idx < len(paths) and len(pending) < prefetch:
+                pending.append(pool.submit(prepare_song, paths[next_idx], duration))
+                next_idx += 1
+
+        refill()
+        while pending:
+            # Block for the oldest file, then take any later ones that are already decoded
+            group = [pending.popleft().result()]
+            n_chunks = len(group[0][0])
+            while pending and pending[0].done() and n_chunks + len(pending[0].result()[0]) <= max_batch:
+                group.append(pending.popleft().result())
+                n_chunks += len(group[-1][0])
+            refill()
+
+            if early_exit is None:
+                preds = predict_batch(model, np.concatenate([batch for batch, _ in group]))
+                songs, offset = [], 0
+                for batch, _ in group:
+                    songs.append((preds[offset:offset + len(batch)], range(len(batch))))
+                    offset += len(batch)
+            else:
+                songs = early_exit_predict(model, [batch for batch, _ in group], early_exit)
+            for (batch, bounds), (song_preds, used) in zip(group, songs):
+                if counts is not None:
+                    counts["windows"] = counts.get("windows", 0) + len(batch)
+                    counts["evaluated"] = counts.get("evaluated", 0) + len(used)
+                avg_pred, timeline = summarize(song_preds, [bounds[i] for i in used])
+                yield song_preds, avg_pred, timeline
+
+def _streamed_scan(model, paths, workers, prefetch, early_exit, counts):
+    def analyze(path):
+        own = {}  # per-file counts, merged on the calling thread
+        return analyze_stream(model, path, early_exit, own), own
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        next_idx = 0
+
+        def refill():
+            nonlocal next_idx
+            while next_idx < len(paths) and len(pending) < prefetch:
+                pending.append(pool.submit(analyze, paths[next_idx]))
+                next_idx += 1
+
+        refill()
+        while pending:
+            result, own = pending.popleft().result()
+            refill()
+            if counts is not None:
+                for name, n in own.items():
+                    counts[name] = counts.get(name, 0) + n
+            yield result
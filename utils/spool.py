@@ -0,0 +1,136 @@
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+from utils.cache import audio_digest
+
+SPOOL_DIR = Path(os.environ.get("EMOTION_SPOOL_DIR", "temp_audio"))
+MAX_SPOOL_BYTES = int(os.environ.get("EMOTION_SPOOL_BYTES", 1024 * 1024 * 1024))
+REF_TTL = 6 * 3600  # a session that has not touched its files for this long no longer pins them
+STALE_SECONDS = 3600  # leftover .tmp files older than this are from dead processes
+SPOOLED_NAME = re.compile(r"^[0-9a-f]{64}(\.[A-Za-z0-9]+)?$")
+
+def session_owner():
+    """The current Streamlit session id, or "local" outside a script run."""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+    except ImportError:
+        ctx = None
+    return ctx.session_id if ctx else "local"
+
+class AudioSpool:
+    """Content-addressed audio files on disk, bounded by total size with LRU eviction.
+
+    Files are named by the sha256 of their bytes, so identical uploads share
+    one file and different uploads never collide. Sessions hold references to
+    the files they play; referenced files are never evicted, and a session's
+    references lapse after REF_TTL without a touch(). On construction,
+    half-written .tmp files of dead processes and files not named by hash
+    (older versions wrote uploads by name) are removed.
+    """
+
+    def __init__(self, root=SPOOL_DIR, max_bytes=MAX_SPOOL_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._refs = {}  # owner -> {digest}
+        self._seen = {}  # owner -> last touch
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.recover()
+
+    def recover(self):
+        now = time.time()
+        for entry in os.scandir(self.root):
+            try:
+                if entry.name.endswith(".tmp"):
+                    if now - entry.stat().st_mtime > STALE_SECONDS:
+                        os.remove(entry.path)
+                elif entry.is_file() and not SPOOLED_NAME.match(entry.name):
+                    os.remove(entry.path)
+            except OSError:
+                continue
+        self.evict()
+
+    def put(self, data, suffix="", owner=None, digest=None):
+        """Store data (if not already stored), reference it for owner and return its path."""
+        digest = digest or audio_digest(data)
+        path = self.root / f"{digest}{suffix.lower()}"
+        self.acquire(digest, owner)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        self.evict()
+        return path
+
+    def acquire(self, digest, owner=None):
+        owner = owner or session_owner()
+        with self._lock:
+            self._refs.setdefault(owner, set()).add(digest)
+            self._seen[owner] = time.time()
+
+    def touch(self, owner=None):
+        """Keep owner's references alive (call on every rerun that still uses them)."""
+        owner = owner or session_owner()
+        with self._lock:
+            if owner in self._refs:
+                self._seen[owner] = time.time()
+
+    def release(self, owner=None):
+        """Drop all of owner's references; the files stay until evicted."""
+        owner = owner or session_owner()
+        with self._lock:
+            self._refs.pop(owner, None)
+            self._seen.pop(owner, None)
+
+    def _live_refs(self):
+        cutoff = time.time() - REF_TTL
+        with self._lock:
+            for owner in [o for o, seen in self._seen.items() if seen < cutoff]:
+                self._refs.pop(owner, None)
+                self._seen.pop(owner, None)
+            return {owner: set(digests) for owner, digests in self._refs.items()}
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.root):
+            if entry.is_file() and SPOOLED_NAME.match(entry.name):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime_ns, st.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        pinned = set().union(*self._live_refs().values())
+        for _, size, path in sorted(entries):
+            if Path(path).name[:64] in pinned:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+_default_spool = None
+_spool_lock = threading.Lock()
+
+def get_spool():
+    global _default_spool
+    with _spool_lock:
+        if _default_spool is None:
+            _default_spool = AudioSpool()
+        return _default_spool
@@ -0,0 +1,160 @@
+import subprocess
+
+import numpy as np
+import librosa
+import soundfile as sf
+import soxr
+
+from utils.audio_utils import SR, N_FFT, HOP_LENGTH, TARGET_FRAMES, get_front_end
+from utils.inference import EMOTION_CLASSES, EARLY_EXIT_MIN_CHUNKS, build_batch, predict_batch, summarize, top2_margin
+from utils.timing import timed
+from utils.media import FFMPEG
+
+BLOCK_SECONDS = 10
+STREAM_BATCH = 8
+# Samples covering one TARGET_FRAMES window of uncentered frames, and the stride between windows
+WINDOW_SAMPLES = (TARGET_FRAMES - 1) * HOP_LENGTH + N_FFT
+WINDOW_STRIDE = TARGET_FRAMES * HOP_LENGTH
+
+def stream_audio(path, block_seconds=BLOCK_SECONDS):
+    """Yield mono float32 blocks of the file at SR without holding the whole track."""
+    try:
+        f = sf.SoundFile(path)
+    except (sf.LibsndfileError, RuntimeError):
+        # Container libsndfile can't read (m4a, mp3 on older libsndfile): decode it through an ffmpeg pipe
+        yield from _ffmpeg_blocks(path, block_seconds)
+        return
+
+    with f:
+        resampler = soxr.ResampleStream(f.samplerate, SR, 1, dtype="float32") if f.samplerate != SR else None
+        for block in f.blocks(blocksize=int(f.samplerate * block_seconds), dtype="float32", always_2d=True):
+            y = block.mean(axis=1)
+            yield resampler.resample_chunk(y) if resampler else y
+        if resampler:
+            yield resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+
+def _ffmpeg_blocks(path, block_seconds):
+    """Blocks of ffmpeg's f32le output, read from its stdout as it decodes.
+
+    Without ffmpeg on PATH this falls back to librosa.load, which decodes the
+    whole file into memory before the first block is handed out.
+    """
+    cmd = [FFMPEG, "-nostdin", "-v", "error", "-protocol_whitelist", "file,pipe", "-i", f"file:{path}",
+           "-vn", "-ac", "1", "-ar", str(SR), "-f", "f32le", "pipe:1"]
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError:
+        y, _ = librosa.load(path, sr=SR, mono=True)
+        step = int(SR * block_seconds)
+        for start in range(0, len(y), step):
+            yield y[start:start + step]
+        return
+    block_bytes = int(SR * block_seconds) * 4
+    try:
+        while data := proc.stdout.read(block_bytes):
+            yield np.frombuffer(data[:len(data) - len(data) % 4], dtype=np.float32)
+        if proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed: {proc.stderr.read().decode(errors='replace').strip()}")
+    finally:
+        # Consumers may stop early (early exit); don't leave ffmpeg blocked on a full pipe
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+        proc.stderr.close()
+
+@timed("mel")
+def _window_logmel(y):
+    # Same front-end (STFT, filterbank, dB) as the whole-track path, with uncentered frames
+    return get_front_end().logmel(y, center=False)
+
+def stream_windows(path, block_seconds=BLOCK_SECONDS):
+    """Yield (start_s, end_s, log-mel) for consecutive TARGET_FRAMES windows as the audio arrives.
+
+    Only the current window's samples (plus one block) are buffered, so memory
+    does not depend on track length. Mels come from the same front-end as
+    the whole-track path, but frames are uncentered and each window is
+    scaled to dB against its own peak and floored TOP_DB below it, where the
+    whole-track path floors against the track's peak. The per-window z-score
+    in build_batch cancels the reference shift, so the two agree up to frame
+    alignment except in windows with content more than TOP_DB below the
+    track's peak.
+    """
+    buf = np.zeros(0, dtype=np.float32)
+    offset = 0
+    emitted = False
+    for block in stream_audio(path, block_seconds):
+        buf = np.concatenate([buf, block])
+        while len(buf) >= WINDOW_SAMPLES:
+            yield offset / SR, (offset + WINDOW_STRIDE) / SR, _window_logmel(buf[:WINDOW_SAMPLES])
+            emitted = True
+            buf = buf[WINDOW_STRIDE:]
+            offset += WINDOW_STRIDE
+
+    # Trailing partial window (padded to TARGET_FRAMES later by build_batch)
+    if len(buf) >= N_FFT or (not emitted and len(buf) > 0):
+        if len(buf) < N_FFT:
+            buf = np.pad(buf, (0, N_FFT - len(buf)))
+        yield offset / SR, (offset + len(buf)) / SR, _window_logmel(buf)
+
+def stream_predictions(model, path, batch_windows=STREAM_BATCH, block_seconds=BLOCK_SECONDS):
+    """Yield (start_s, end_s, probabilities) per window, predicting every batch_windows windows."""
+    pending = []
+
+    def flush():
+        preds = predict_batch(model, build_batch([mel for _, _, mel in pending]))
+        out = [(start, end, p) for (start, end, _), p in zip(pending, preds)]
+        pending.clear()
+        return out
+
+    for window in stream_windows(path, block_seconds):
+        pending.append(window)
+        if len(pending) >= batch_windows:
+            yield from flush()
+    if pending:
+        yield from flush()
+
+def stream_windows_total(path):
+    """Approximate number of windows in path, from the header alone; None if libsndfile can't read it."""
+    try:
+        samples = sf.info(path).duration * SR
+    except (sf.LibsndfileError, RuntimeError):
+        return None
+    return max(1, int(np.ceil(samples / WINDOW_STRIDE)))
+
+def analyze_stream(model, path, early_exit=None, counts=None, batch_windows=STREAM_BATCH):
+    """Full-length counterpart of inference.analyze_windows at constant memory.
+
+    Only the running sum of predictions, the window bounds and the per-window
+    probabilities are kept, never the mels or model inputs. With early_exit
+    (a top-2 margin) decoding stops at the end of the first predicted batch
+    (at least EARLY_EXIT_MIN_CHUNKS windows) whose running mean is that
+    decisive; windows are taken in playback order since the rest of the file
+    has not been read yet. `counts` accumulates "windows" and "evaluated"
+    like pipeline.pipelined_scan.
+    """
+    bounds, preds = [], []
+    total = np.zeros(len(EMOTION_CLASSES))
+    stopped = False
+    stream = stream_predictions(model, path, batch_windows)
+    try:
+        for start, end, p in stream:
+            bounds.append((start, end))
+            preds.append(p)
+            total += p
+            n = len(preds)
+            if (early_exit is not None and n >= EARLY_EXIT_MIN_CHUNKS and n % batch_windows == 0
+                    and top2_margin(total / n) >= early_exit):
+                stopped = True
+                break
+    finally:
+        stream.close()  # stops the decoder too
+    if not preds:
+        raise ValueError("Audio file is empty or too short.")
+    if counts is not None:
+        windows = (stream_windows_total(path) if stopped else None) or len(preds)
+        counts["windows"] = counts.get("windows", 0) + max(windows, len(preds))
+        counts["evaluated"] = counts.get("evaluated", 0) + len(preds)
+    preds = np.array(preds)
+    _, timeline = summarize(preds, bounds)
+    return preds, total / len(preds), timeline
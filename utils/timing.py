@@ -0,0 +1,131 @@
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# JSON-lines span log, off unless EMOTION_TIMING_LOG names a file
+TIMING_LOG = os.environ.get("EMOTION_TIMING_LOG", "")
+TIMING_LOG_MAX_BYTES = int(float(os.environ.get("EMOTION_TIMING_LOG_MAX_MB", 10)) * 1024 * 1024)
+FLUSH_SECONDS = 1.0
+MAX_PENDING = 10000  # log records kept while the writer is behind; older ones are dropped
+MAX_SAMPLES = 1000
+
+_lock = threading.Lock()
+_samples = defaultdict(lambda: deque(maxlen=MAX_SAMPLES))
+_counts = defaultdict(int)
+_pending = deque(maxlen=MAX_PENDING)
+_writer = None
+_flush_lock = threading.Lock()  # one writer at a time (the thread, or flush() at exit)
+
+def record(name, seconds, **fields):
+    ms = seconds * 1e3
+    with _lock:
+        _samples[name].append(ms)
+        _counts[name] += 1
+        if TIMING_LOG:
+            _pending.append({"ts": time.time(), "pid": os.getpid(), "span": name, "ms": round(ms, 3), **fields})
+            _start_writer()
+
+def _start_writer():
+    # Called with _lock held; file I/O happens on the writer thread, never on the caller's
+    global _writer
+    if _writer is None:
+        _writer = threading.Thread(target=_write_loop, name="timing-log", daemon=True)
+        _writer.start()
+        atexit.register(flush)
+
+def _after_fork():
+    # The writer thread does not survive fork; the child starts its own on its first record
+    global _writer
+    _writer = None
+    _pending.clear()
+
+os.register_at_fork(after_in_child=_after_fork)
+
+def _write_loop():
+    while True:
+        time.sleep(FLUSH_SECONDS)
+        flush()
+
+def flush():
+    """Append pending log records to TIMING_LOG, rotating it to TIMING_LOG + ".1" past TIMING_LOG_MAX_BYTES."""
+    with _flush_lock:
+        with _lock:
+            records = list(_pending)
+            _pending.clear()
+        if records and TIMING_LOG:
+            _append(records)
+
+def _append(records):
+    try:
+        if os.path.exists(TIMING_LOG) and os.path.getsize(TIMING_LOG) > TIMING_LOG_MAX_BYTES:
+            os.replace(TIMING_LOG, TIMING_LOG + ".1")
+        with open(TIMING_LOG, "a") as f:
+            f.write("".join(json.dumps(r) + "\n" for r in records))
+    except OSError:
+        pass
+
+@contextmanager
+def span(name, **fields):
+    """Time the enclosed block under `name`; extra fields go to the log line only."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start, **fields)
+
+def timed(name):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def stats():
+    """Per-span count (since process start) and latency percentiles over the last MAX_SAMPLES calls."""
+    with _lock:
+        snapshot = {name: (list(samples), _counts[name]) for name, samples in _samples.items()}
+    out = {}
+    for name, (samples, count) in sorted(snapshot.items()):
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        out[name] = {"count": count, "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99),
+                     "max_ms": max(samples)}
+    return out
+
+def reset():
+    with _lock:
+        _samples.clear()
+        _counts.clear()
+
+def diagnostics_panel():
+    """Optional sidebar table of span timings for this server process."""
+    import streamlit as st
+    with st.sidebar:
+        if not st.checkbox("⏱️ Show diagnostics", key="show_diagnostics"):
+            return
+        rows = [{"stage": name, **{k: round(v, 1) if k != "count" else v for k, v in s.items()}}
+                for name, s in stats().items()]
+        if rows:
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+        else:
+            st.caption("No timings recorded yet.")
+        from utils.model_loader import get_registry
+        models = get_registry().stats()
+        if models["models"]:
+            st.caption(f"Loaded models: {models['bytes'] / 1e6:.0f} / {models['max_bytes'] / 1e6:.0f} MB, "
+                       f"{models['reloads']} reloads, {models['evictions']} evictions")
+            st.dataframe(models["models"], hide_index=True, use_container_width=True)
+        from utils.batching import stats as batching_stats
+        batchers = batching_stats()
+        if batchers:
+            st.caption("Inference micro-batching")
+            st.dataframe([{k: v for k, v in b.items() if k != "batch_rows_hist"} for b in batchers],
+                         hide_index=True, use_container_width=True)
@@ -0,0 +1,143 @@
+import io, base64
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import matplotlib
+import matplotlib.pyplot as plt
+import librosa, librosa.display
+from PIL import Image
+
+from utils.audio_utils import SR
+
+# Same pixel size the 10x2 in, dpi=100 figures had
+IMAGE_WIDTH = 1000
+IMAGE_HEIGHT = 200
+WAVE_RGBA = (255, 215, 0, 153)  # #ffd700 at alpha 0.6
+MAX_IMAGES = 32
+
+def fig_to_base64(fig):
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", bbox_inches="tight", dpi=100, transparent=True)
+    plt.close(fig)
+    return base64.b64encode(buf.getvalue()).decode()
+
+def plot_audio_visuals(y, mel):
+    # Full-resolution matplotlib figures; the page uses the cached renderers below
+    # Waveform
+    fig1, ax1 = plt.subplots(figsize=(10, 2))
+    librosa.display.waveshow(y, sr=SR, ax=ax1, color="#ffd700", alpha=0.6)
+    ax1.axis('off')
+    fig1.patch.set_alpha(0)
+
+    # Mel
+    fig2, ax2 = plt.subplots(figsize=(10, 2))
+    librosa.display.specshow(mel, sr=SR, cmap='magma', ax=ax2)
+    ax2.axis('off')
+    fig2.patch.set_alpha(0)
+
+    return fig1, fig2
+
+def _column_edges(n, width):
+    width = max(1, min(width, n))
+    return np.linspace(0, n, width + 1).astype(int)[:-1]
+
+def waveform_envelope(y, width=IMAGE_WIDTH):
+    """Per-pixel-column (min, max) of y; reduceat works on y in place, no resampled copy."""
+    if len(y) == 0:
+        return np.zeros(1, dtype=np.float32), np.zeros(1, dtype=np.float32)
+    edges = _column_edges(len(y), width)
+    return np.minimum.reduceat(y, edges), np.maximum.reduceat(y, edges)
+
+def downsample_mel(mel, width=IMAGE_WIDTH, height=None):
+    """Mean-pool mel frames into at most `width` columns and pick `height` rows (nearest), low bins last."""
+    edges = _column_edges(mel.shape[1], width)
+    pooled = np.add.reduceat(mel, edges, axis=1) / np.diff(np.append(edges, mel.shape[1]))
+    if height is not None:
+        pooled = pooled[np.linspace(0, mel.shape[0] - 1, height).round().astype(int)]
+    return pooled[::-1]
+
+def render_waveform(y, width=IMAGE_WIDTH, height=IMAGE_HEIGHT):
+    lo, hi = waveform_envelope(y, width)
+    scale = max(float(np.abs(lo).max()), float(np.abs(hi).max()), 1e-9)
+    # Row 0 is the top of the image: amplitude +scale
+    top = ((1 - hi / scale) / 2 * (height - 1)).round()
+    bottom = ((1 - lo / scale) / 2 * (height - 1)).round()
+    rows = np.arange(height)[:, None]
+    mask = (rows >= top) & (rows <= bottom)
+    rgba = np.zeros((height, len(lo), 4), dtype=np.uint8)
+    rgba[mask] = WAVE_RGBA
+    return _png(rgba)
+
+def render_mel(mel, width=IMAGE_WIDTH, height=IMAGE_HEIGHT):
+    img = downsample_mel(mel, width, height)
+    lo, hi = img.min(), img.max()
+    norm = (img - lo) / (hi - lo) if hi > lo else np.zeros_like(img)
+    return _png(matplotlib.colormaps["magma"](norm, bytes=True))
+
+def _png(rgba):
+    buf = io.BytesIO()
+    Image.fromarray(rgba, "RGBA").save(buf, format="PNG", compress_level=3)
+    return buf.getvalue()
+
+_images = OrderedDict()
+_images_lock = threading.Lock()
+
+def cached_visuals(digest, y, mel, width=IMAGE_WIDTH, height=IMAGE_HEIGHT):
+    """(waveform PNG, mel PNG) bytes, cached per process by audio hash and pixel size."""
+    key = (digest, width, height)
+    with _images_lock:
+        if key in _images:
+            _images.move_to_end(key)
+            return _images[key]
+    # The mel map is smooth, so half resolution is indistinguishable once the browser scales it up
+    images = (render_waveform(y, width, height), render_mel(mel, width // 2, height // 2))
+    with _images_lock:
+        _images[key] = images
+        while len(_images) > MAX_IMAGES:
+            _images.popitem(last=False)
+    return images
+
+# The chart specs below ship one flat array per field and let Vega-Lite expand it
+# (flatten + row_number), so the payload is the numbers only.
+
+def waveform_chart_spec(y, width=IMAGE_WIDTH // 2):
+    """Vega-Lite area chart of the min/max envelope, for sending arrays instead of a PNG."""
+    lo, hi = waveform_envelope(y, width)
+    return {
+        "data": {"values": [{"lo": np.round(lo, 3).tolist(), "hi": np.round(hi, 3).tolist()}]},
+        "transform": [
+            {"flatten": ["lo", "hi"]},
+            {"window": [{"op": "row_number", "as": "x"}]},
+        ],
+        "mark": {"type": "area", "color": "#ffd700", "opacity": 0.6},
+        "encoding": {
+            "x": {"field": "x", "type": "quantitative", "axis": None},
+            "y": {"field": "lo", "type": "quantitative", "axis": None},
+            "y2": {"field": "hi"},
+        },
+        "height": 120,
+        "config": {"view": {"stroke": None}},
+    }
+
+def mel_chart_spec(mel, width=IMAGE_WIDTH // 5, height=64):
+    """Vega-Lite heatmap of a downsampled mel map with dB values quantised to whole numbers."""
+    img = downsample_mel(mel, width, height)
+    cols = img.shape[1]
+    return {
+        "data": {"values": [{"db": img.round().astype(int).ravel().tolist()}]},
+        "transform": [
+            {"flatten": ["db"]},
+            {"window": [{"op": "row_number", "as": "i"}]},
+            {"calculate": f"(datum.i - 1) % {cols}", "as": "t"},
+            {"calculate": f"floor((datum.i - 1) / {cols})", "as": "f"},
+        ],
+        "mark": {"type": "rect"},
+        "encoding": {
+            "x": {"field": "t", "type": "ordinal", "axis": None},
+            "y": {"field": "f", "type": "ordinal", "axis": None},
+            "color": {"field": "db", "type": "quantitative", "scale": {"scheme": "magma"}, "legend": None},
+        },
+        "height": 120,
+        "config": {"view": {"stroke": None}},
+    }
@@ -0,0 +1,71 @@
+import io
+import threading
+import time
+
+import numpy as np
+
+from utils.backends import DEFAULT_BACKEND
+
+DEFAULT_MODEL_PATH = "mobileNetV2.keras"
+
+_lock = threading.Lock()
+_thread = None
+_done = threading.Event()
+_status = {"steps": {}, "error": None}
+
+def warmup(path=DEFAULT_MODEL_PATH, backend=DEFAULT_BACKEND):
+    """Pay the one-off startup costs before the first user does.
+
+    Imports TensorFlow and librosa, triggers librosa's numba compilation for the
+    mel and personality paths, loads the model through the shared loader and
+    runs one dummy batch so graph tracing is done too.
+    """
+    steps = _status["steps"]
+
+    def step(name, fn):
+        start = time.perf_counter()
+        result = fn()
+        steps[name] = time.perf_counter() - start
+        return result
+
+    step("import_tensorflow", lambda: __import__("tensorflow"))
+    step("import_librosa", lambda: __import__("librosa"))
+
+    import soundfile as sf
+    from utils.audio_utils import SR, N_MELS, TARGET_FRAMES, extract_logmel
+    from utils.personality import SR as FEATURE_SR, extract_features
+    from utils.inference import predict_batch
+    from utils.model_loader import load_emotion_model
+
+    step("mel_jit", lambda: extract_logmel(np.zeros(SR, dtype=np.float32)))
+    t = np.arange(FEATURE_SR * 3) / FEATURE_SR
+    buf = io.BytesIO()
+    sf.write(buf, (0.1 * np.sin(2 * np.pi * 220 * t)).astype(np.float32), FEATURE_SR, format="WAV")
+    buf.seek(0)
+    step("personality_jit", lambda: extract_features(buf))
+
+    model = step("load_model", lambda: load_emotion_model(path, backend))
+    step("first_predict", lambda: predict_batch(model, np.zeros((1, N_MELS, TARGET_FRAMES, 3), dtype=np.float32)))
+
+def _run(path, backend):
+    try:
+        warmup(path, backend)
+    except Exception as e:
+        _status["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        _done.set()
+
+def start_warmup(path=DEFAULT_MODEL_PATH, backend=DEFAULT_BACKEND):
+    """Start warmup() on a daemon thread, once per process; later calls are no-ops."""
+    global _thread
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_run, args=(path, backend), name="emotion-warmup", daemon=True)
+            _thread.start()
+    return _thread
+
+def wait_warmup(timeout=None):
+    return _done.wait(timeout)
+
+def warmup_status():
+    return {"done": _done.is_set(), **_status}
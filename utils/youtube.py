@@ -0,0 +1,95 @@
+import hashlib
+import subprocess
+from collections import namedtuple
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+from utils.audio_utils import SR, extract_logmel_chunks
+from utils.cache import get_cache
+from utils.inference import NUM_CHUNKS, analyze_chunks
+from utils.media import FFMPEG
+from utils.timing import span
+
+AUDIO_FORMAT = "bestaudio/best"
+YOUTUBE_HOSTS = ("youtube.com", "youtu.be", "youtube-nocookie.com")
+PROTOCOL_WHITELIST = "https,tls,tcp"  # ffmpeg may only open remote https streams, never files or other protocols
+
+# url is the stream ffmpeg opens: the googlevideo URL yt-dlp resolved the link to
+AudioSource = namedtuple("AudioSource", "id url headers")
+
+def is_youtube(url):
+    parsed = urlparse(url)
+    host = parsed.hostname or ""
+    return parsed.scheme in ("http", "https") and any(host == h or host.endswith("." + h) for h in YOUTUBE_HOSTS)
+
+def source_id(url):
+    """Stable cache identity for a link, computed without touching the network.
+
+    YouTube links map to their video id, so every URL form of the same video
+    shares one entry; other URLs are identified by the URL itself.
+    """
+    if is_youtube(url):
+        parsed = urlparse(url)
+        if parsed.hostname.endswith("youtu.be"):
+            vid = parsed.path.strip("/").split("/")[0]
+        elif "v" in parse_qs(parsed.query):
+            vid = parse_qs(parsed.query)["v"][0]
+        else:
+            # /shorts/<id>, /embed/<id>, /live/<id>
+            parts = [p for p in parsed.path.split("/") if p]
+            vid = parts[1] if len(parts) > 1 else ""
+        if vid:
+            return f"youtube:{vid}"
+    return "url:" + hashlib.sha256(url.encode()).hexdigest()
+
+def resolve(url):
+    """AudioSource for a YouTube link via yt-dlp (metadata only, nothing downloaded).
+
+    Anything else raises ValueError: the link comes from a public text box and
+    must never reach ffmpeg as a local path or an arbitrary URL.
+    """
+    if not is_youtube(url):
+        raise ValueError("Not a YouTube link.")
+    from yt_dlp import YoutubeDL
+    with span("ytdlp_resolve"), YoutubeDL({"format": AUDIO_FORMAT, "quiet": True, "noplaylist": True}) as ydl:
+        info = ydl.extract_info(url, download=False)
+    return AudioSource(f"youtube:{info['id']}", info["url"], info.get("http_headers") or {})
+
+def decode(source, sr=SR, duration=100):
+    """First `duration` seconds of source as mono float32 at sr.
+
+    ffmpeg reads the native container (m4a/webm/...) straight from the URL and
+    stops after `duration`, so only that much of the stream is fetched and
+    nothing is transcoded to an intermediate file.
+    """
+    cmd = [FFMPEG, "-nostdin", "-v", "error", "-protocol_whitelist", PROTOCOL_WHITELIST]
+    if source.headers:
+        cmd += ["-headers", "".join(f"{k}: {v}\r\n" for k, v in source.headers.items())]
+    cmd += ["-i", source.url, "-vn", "-ac", "1", "-ar", str(sr), "-f", "f32le"]
+    if duration is not None:
+        cmd += ["-t", str(duration)]
+    cmd.append("pipe:1")
+    with span("decode"):
+        proc = subprocess.run(cmd, capture_output=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {proc.stderr.decode(errors='replace').strip()}")
+    y = np.frombuffer(proc.stdout, dtype=np.float32)
+    if len(y) == 0:
+        raise ValueError("Audio file is empty or too short.")
+    return y
+
+def analyze_link(model, model_id, url, num_chunks=NUM_CHUNKS, duration=100, resolver=resolve):
+    """(preds, avg_pred, timeline) for a link, cached on disk by source_id so repeats skip the network.
+
+    `resolver` maps the link to an AudioSource; only resolve() may see user
+    input. Benchmarks pass a stand-in to run against a local server.
+    """
+    key = get_cache().key(source_id(url), model=model_id, mode="chunks", num_chunks=num_chunks, duration=duration)
+
+    def compute():
+        y = decode(resolver(url), SR, duration)
+        return analyze_chunks(model, y, num_chunks, mels=extract_logmel_chunks(y, num_chunks)[1])
+
+    preds, avg_pred, timeline = get_cache().get_or_compute(key, compute)
+    return np.asarray(preds), np.asarray(avg_pred), [tuple(t) for t in timeline]